@@ -91,13 +91,15 @@ def etl_legacy_data():
 
     def transform_legacy_global_data(ti):
         # Не запускаю с помощью call_command, тк надо будет преобразовывать data в str в handle
+        from django.conf import settings
         from apps.etl.management.commands.transform_legacy_global_data import Command
-        data = Command().handle(debug=False)
+        data = Command().handle(debug=False, pushdown=settings.LEGACY_SQL_PUSHDOWN)
         ti.xcom_push(key='data', value=data)
 
     def transform_legacy_region_data(ti):
+        from django.conf import settings
         from apps.etl.management.commands.transform_legacy_region_data import Command
-        data = Command().handle(debug=False)
+        data = Command().handle(debug=False, pushdown=settings.LEGACY_SQL_PUSHDOWN)
         ti.xcom_push(key='data', value=data)
 
     csv_import_task = DjangoOperator(
@@ -186,7 +188,7 @@ def import_external_data():
 
     def stopcorona_import(ti):
         from apps.etl.management.commands.import_stopcorona_data import Command
-        value = Command().handle(manual=True, all=False)
+        value = Command().handle(manual=True, all=False, force=False)
         ti.xcom_push(key='is_updated', value=value)
 
     gogov_import_task = DjangoOperator(
@@ -219,7 +221,7 @@ def import_external_data():
 def stopcorona_all_import():
     def stopcorona_import():
         from django.core.management import call_command
-        call_command('import_stopcorona_data', all=True)
+        call_command('import_stopcorona_data', all=True, force=True)
 
     stopcorona_import_task = DjangoOperator(
         task_id='stopcorona_import',
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
-from apps.etl.models import GlobalTransformedData, RegionTransformedData
+from apps.etl.models import GlobalTransformedData, RegionTransformedData, TransformedDataVersion
 
 INVALID = 'INVL'
 
@@ -17,3 +19,8 @@ class DatasetInfo(models.Model):
 
     class Meta:
         unique_together = ['dataset_name', 'model_name', ]
+
+
+@receiver([post_save, post_delete], sender=DatasetInfo)
+def bump_dataset_info_version(sender, **kwargs):
+    TransformedDataVersion.bump(sender)
@@ -0,0 +1,168 @@
+import json
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_ARROW_TYPES = {
+    'AutoField': pa.int64(),
+    'BigAutoField': pa.int64(),
+    'IntegerField': pa.int64(),
+    'BigIntegerField': pa.int64(),
+    'FloatField': pa.float64(),
+    'DateField': pa.date32(),
+}
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders results as newline delimited JSON, one item per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('results', [data])
+
+        return ''.join(f'{_dumps(item)}\n' for item in data).encode(self.charset)
+
+
+class ArrowRenderer(BaseRenderer):
+    """Renders results as Apache Arrow IPC stream"""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        table = _get_results_table(data, renderer_context)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        return sink.getvalue().to_pybytes()
+
+
+class ParquetRenderer(BaseRenderer):
+    """Renders results as Apache Parquet file"""
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        sink = pa.BufferOutputStream()
+        pq.write_table(_get_results_table(data, renderer_context), sink)
+
+        return sink.getvalue().to_pybytes()
+
+
+def _get_results_table(data, renderer_context=None):
+    """Table of page results, typed by schema of view, if it's given, otherwise types are inferred from values"""
+    if isinstance(data, dict):
+        data = data.get('results', [data])
+
+    schema = (renderer_context or {}).get('arrow_schema')
+    return pa.Table.from_pylist(list(data), schema=schema)
+
+
+def _dumps(item):
+    return json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def _iter_chunks(rows, chunk_size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def iter_json(rows, fields, chunk_size, count):
+    """Yields JSON object with count and results array, which is encoded by chunks of values_list rows"""
+    yield f'{{"count":{count},"results":['
+    for i, chunk in enumerate(_iter_chunks(rows, chunk_size)):
+        yield (',' if i else '') + ','.join(_dumps(dict(zip(fields, row))) for row in chunk)
+    yield ']}'
+
+
+def iter_ndjson(rows, fields, chunk_size):
+    for chunk in _iter_chunks(rows, chunk_size):
+        yield ''.join(f'{_dumps(dict(zip(fields, row)))}\n' for row in chunk)
+
+
+STREAMING_ENCODERS = {
+    'json': (iter_json, 'application/json'),
+    'ndjson': (iter_ndjson, NDJSONRenderer.media_type),
+}
+
+
+def get_arrow_schema(model, fields):
+    return pa.schema([
+        pa.field(field, _ARROW_TYPES.get(model._meta.get_field(field).get_internal_type(), pa.string()))
+        for field in fields
+    ])
+
+
+def iter_record_batches(rows, schema, chunk_size):
+    """Builds record batches from chunks of values_list rows, every column is converted to array at once"""
+    for chunk in _iter_chunks(rows, chunk_size):
+        columns = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+        yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+class _ChunksSink:
+    """Write-only file which gives away written bytes by chunks, but keeps position for writers"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_arrow(batches, schema):
+    sink = _ChunksSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.pop()
+
+    writer.close()
+    yield sink.pop()
+
+
+def iter_parquet(batches, schema):
+    sink = _ChunksSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.pop()
+
+    writer.close()
+    yield sink.pop()
+
+
+COLUMNAR_ENCODERS = {
+    'arrow': (iter_arrow, ArrowRenderer.media_type),
+    'parquet': (iter_parquet, ParquetRenderer.media_type),
+}
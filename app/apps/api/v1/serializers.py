@@ -27,6 +27,8 @@ class DatasetParamsSerializer(serializers.Serializer):
     fields = serializers.ListField(help_text='comma separated list of fields', required=False)
     regions = serializers.ListField(help_text='comma separated list of regions names', required=False)
     all = serializers.BooleanField(required=False, help_text='return all dataset items', default=False)
+    pagination = serializers.ChoiceField(choices=('page', 'cursor'), required=False, default='page',
+                                         help_text='page - page number pagination, cursor - keyset pagination')
     model = serializers.SerializerMethodField()
 
 
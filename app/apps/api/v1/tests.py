@@ -1,14 +1,23 @@
+import csv
+import io
+import json
 from collections import OrderedDict
 from datetime import date
 
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework.utils.encoders import JSONEncoder
 
 from apps.api.models import DatasetInfo
 from apps.api.v1.views import DatasetsInfo, Regions, Dataset
-from apps.etl.models import RegionTransformedData, Region, GlobalTransformedData
+from apps.etl.models import RegionTransformedData, Region, GlobalTransformedData, TransformedDataVersion
 
 
 class DatasetsInfoViewTestCase(APITestCase):
@@ -57,6 +66,20 @@ class DatasetsInfoViewTestCase(APITestCase):
                             (self.global_info, self.region_info)]
         self.assertListEqual(estimated_result, response.data)
 
+    def test_conditional_get_request(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/datasets-info/', format='json')
+        etag = response['ETag']
+
+        response = self.client.get('/api/v1/datasets-info/', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.global_info.description = {'fields': [], 'description': 'Updated'}
+        self.global_info.save()
+        response = self.client.get('/api/v1/datasets-info/', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
+
 
 class RegionsViewTestCase(APITestCase):
     def setUp(self):
@@ -76,11 +99,30 @@ class RegionsViewTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertListEqual(self.estimated_result, response.data)
 
+    def test_conditional_get_request(self):
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get('/api/v1/regions/', format='json')['ETag']
+
+        response = self.client.get('/api/v1/regions/', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Region.objects.create(name='Томская обл.')
+        response = self.client.get('/api/v1/regions/', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(4, len(response.data))
+
+        etag = response['ETag']
+        Region.objects.filter(name='Томская обл.').delete()
+        response = self.client.get('/api/v1/regions/', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(3, len(response.data))
+
 
 class DatasetViewTestCase(APITestCase):
     request_template = '/api/v1/datasets/{}/'
 
     def setUp(self):
+        cache.clear()
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username='admin', password='admin', email='admin@admin.ru')
 
@@ -179,6 +221,14 @@ class DatasetViewTestCase(APITestCase):
             weekly_recovered=3,
         )
 
+    @staticmethod
+    def _encode(data):
+        return json.loads(json.dumps(data, cls=JSONEncoder))
+
+    @staticmethod
+    def _get_streamed_json(response):
+        return json.loads(b''.join(response.streaming_content))
+
     def test_global_dataset_request_without_filters(self):
         self.client.force_authenticate(user=self.user)
         response = self.client.get(self.request_template.format(self.global_info.dataset_name), format='json')
@@ -259,12 +309,12 @@ class DatasetViewTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        estimated_result = OrderedDict({
+        estimated_result = {
             'count': RegionTransformedData.objects.count(),
             'results': list(RegionTransformedData.objects.values()),
-        })
+        }
 
-        self.assertDictEqual(estimated_result, response.data)
+        self.assertDictEqual(self._encode(estimated_result), self._get_streamed_json(response))
 
         self.client.force_authenticate(user=self.user)
         url = self.request_template.format(self.global_info.dataset_name) + '?all=true'
@@ -272,12 +322,12 @@ class DatasetViewTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        estimated_result = OrderedDict({
+        estimated_result = {
             'count': GlobalTransformedData.objects.count(),
             'results': list(GlobalTransformedData.objects.values()),
-        })
+        }
 
-        self.assertDictEqual(estimated_result, response.data)
+        self.assertDictEqual(self._encode(estimated_result), self._get_streamed_json(response))
 
     def test_requests_with_fields_filter(self):
         fields = ['weekly_infected', 'weekly_deaths', 'weekly_recovered', ]
@@ -287,12 +337,12 @@ class DatasetViewTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        estimated_result = OrderedDict({
+        estimated_result = {
             'count': GlobalTransformedData.objects.count(),
             'results': list(GlobalTransformedData.objects.values(*fields)),
-        })
+        }
 
-        self.assertDictEqual(estimated_result, response.data)
+        self.assertDictEqual(self._encode(estimated_result), self._get_streamed_json(response))
 
         fields.append('region')
         self.client.force_authenticate(user=self.user)
@@ -301,10 +351,167 @@ class DatasetViewTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        estimated_result = OrderedDict({
+        estimated_result = {
             'count': RegionTransformedData.objects.count(),
             'results': list(RegionTransformedData.objects.values(*fields)),
+        }
+
+        self.assertDictEqual(self._encode(estimated_result), self._get_streamed_json(response))
+
+    def test_cached_response_until_version_bump(self):
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.global_info.dataset_name)
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(3, response.json()['count'])
+
+        self.global_data_3.delete()
+        cached_response = self.client.get(url, format='json')
+
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, cached_response.content)
+
+        TransformedDataVersion.bump(GlobalTransformedData)
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(2, response.json()['count'])
+
+    def test_conditional_get_request(self):
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.global_info.dataset_name)
+        response = self.client.get(url, format='json')
+        etag = response['ETag']
+
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url + '?all=true', format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        TransformedDataVersion.bump(GlobalTransformedData)
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_conditional_get_request_after_regions_change(self):
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.region_info.dataset_name)
+        etag = self.client.get(url, format='json')['ETag']
+
+        Region.objects.create(name='Новый регион')
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_unknown_dataset_request_without_etag(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.request_template.format('unknown'), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_requests_with_cursor_pagination(self):
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.global_info.dataset_name) + \
+            '?pagination=cursor&page_size=2&fields=weekly_infected,weekly_recovered'
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        self.assertListEqual(
+            list(GlobalTransformedData.objects.order_by('id').values('weekly_infected', 'weekly_recovered')[:2]),
+            response.data['results'],
+        )
+
+        response = self.client.get(response.data['next'], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['next'])
+        self.assertListEqual(
+            list(GlobalTransformedData.objects.order_by('id').values('weekly_infected', 'weekly_recovered')[2:]),
+            response.data['results'],
+        )
+
+    def test_all_requests_are_streamed(self):
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.region_info.dataset_name) + '?all=true'
+        estimated_result = self._encode({
+            'count': RegionTransformedData.objects.count(),
+            'results': list(RegionTransformedData.objects.order_by('id').values()),
         })
 
-        self.assertDictEqual(estimated_result, response.data)
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'{"count":4,'))
+        self.assertDictEqual(estimated_result, json.loads(content))
+
+        response = self.client.get(url + '&format=ndjson', format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertListEqual(estimated_result['results'], [json.loads(line) for line in lines])
+
+        with override_settings(DATASET_EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(url + '&format=ndjson', format='json')
+
+        self.assertEqual(4, len(list(response.streaming_content)))
 
+        response = self.client.get(url + '&format=csv&fields=region,weekly_infected', format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.streaming)
+        header, row = csv.reader(response.content.decode().splitlines())
+        flattened = dict(zip(header, row))
+        self.assertEqual('4', flattened['count'])
+        for i, item in enumerate(estimated_result['results']):
+            self.assertEqual(item['region'], flattened[f'results.{i}.region'])
+            self.assertEqual(str(item['weekly_infected']), flattened[f'results.{i}.weekly_infected'])
+
+    def test_requests_with_columnar_formats(self):
+        fields = ['start_date', 'region', 'weekly_infected', 'weekly_recovered']
+        estimated_result = pd.DataFrame(list(RegionTransformedData.objects.filter(region='Москва').order_by('id')
+                                              .values(*fields)))
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.region_info.dataset_name) + \
+            f'?all=true&regions=Москва&fields={",".join(fields)}'
+
+        response = self.client.get(url + '&format=arrow')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual('application/vnd.apache.arrow.stream', response['Content-Type'])
+        df = pa.ipc.open_stream(b''.join(response.streaming_content)).read_pandas()
+        pd.testing.assert_frame_equal(estimated_result, df, check_dtype=False)
+
+        response = self.client.get(url + '&format=parquet')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        df = pd.read_parquet(io.BytesIO(b''.join(response.streaming_content)))
+        pd.testing.assert_frame_equal(estimated_result, df, check_dtype=False)
+
+    def test_paginated_requests_with_columnar_formats(self):
+        fields = ['start_date', 'region', 'weekly_infected', 'weekly_recovered']
+        schema = pa.schema([('start_date', pa.date32()), ('region', pa.string()), ('weekly_infected', pa.int64()),
+                            ('weekly_recovered', pa.int64())])
+        self.client.force_authenticate(user=self.user)
+        url = self.request_template.format(self.region_info.dataset_name) + f'?page_size=1&fields={",".join(fields)}'
+
+        response = self.client.get(url + '&regions=Ульяновская обл.&format=arrow')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(schema, table.schema)
+        self.assertListEqual([None], table.column('weekly_recovered').to_pylist())
+
+        response = self.client.get(url + '&regions=Московская обл.&format=parquet')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        table = pq.read_table(io.BytesIO(response.content))
+        self.assertEqual(schema, table.schema.remove_metadata())
+        self.assertEqual(0, table.num_rows)
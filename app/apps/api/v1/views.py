@@ -1,3 +1,12 @@
+import hashlib
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
@@ -15,8 +24,10 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from .serializers import (DatasetInfoSerializer, DatasetParamsSerializer,
                           DatasetparamsValidationErrorResponseSerializer, RegionsSerializer)
 from apps.api.models import DatasetInfo, INVALID
-from apps.api.paginators import LargeResultsSetPagination
-from apps.etl.models import RegionTransformedData, Region
+from apps.api.paginators import DatasetCursorPagination, LargeResultsSetPagination
+from apps.api.renderers import (ArrowRenderer, COLUMNAR_ENCODERS, NDJSONRenderer, ParquetRenderer, STREAMING_ENCODERS,
+                                get_arrow_schema, iter_json, iter_record_batches)
+from apps.etl.models import RegionTransformedData, Region, TransformedDataVersion
 
 
 class PermittedTokenBlacklistView(TokenBlacklistView):
@@ -27,7 +38,40 @@ class PermittedTokenBlacklistView(TokenBlacklistView):
         return super().post(request, *args, **kwargs)
 
 
-class DatasetsInfo(generics.ListAPIView):
+class ETagMixin:
+    """
+    Adds strong ETag to successful GET responses and answers 304 to requests with matching If-None-Match,
+    so unchanged data isn't queried, serialized and transferred again.
+    """
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        self.etag = quote_etag(etag) if etag else None
+        if self.etag:
+            not_modified = get_conditional_response(request, etag=self.etag)
+            if not_modified is not None:
+                return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if self.etag and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.etag
+
+        return response
+
+    def get_etag(self):
+        """Hash of data version, request path with params and renderer format, None if version is unknown"""
+        version = self.get_version()
+        if version is None:
+            return None
+
+        key_data = [version, self.request.get_full_path(), self.request.accepted_renderer.format]
+        return hashlib.md5(json.dumps(key_data, default=str).encode()).hexdigest()
+
+    def get_version(self):
+        return TransformedDataVersion.get_version(self.get_queryset().model.__name__)
+
+
+class DatasetsInfo(ETagMixin, generics.ListAPIView):
     """Returns lists of datasets infos"""
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [JWTAuthentication, ]
@@ -40,19 +84,20 @@ class DatasetsInfo(generics.ListAPIView):
         },
     )
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        return super().get(request, *args, **kwargs)
 
 
-class Regions(generics.ListAPIView):
+class Regions(ETagMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated, ]
     authentication_classes = [JWTAuthentication, ]
     queryset = Region.objects.all()
     serializer_class = RegionsSerializer
 
 
-class Dataset(generics.ListAPIView):
+class Dataset(ETagMixin, generics.ListAPIView):
     """Returns dataset by name."""
-    renderer_classes = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (r.CSVRenderer,)
+    renderer_classes = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (r.CSVRenderer, NDJSONRenderer, ArrowRenderer,
+                                                                        ParquetRenderer)
     permission_classes = [permissions.IsAuthenticated, ]
     authentication_classes = [JWTAuthentication, ]
     pagination_class = LargeResultsSetPagination
@@ -66,33 +111,129 @@ class Dataset(generics.ListAPIView):
             OpenApiParameter(name='page', required=False, type=OpenApiTypes.INT, default=1),
             OpenApiParameter(name='page_size', required=False, type=OpenApiTypes.INT, default=100),
             OpenApiParameter(name='all',
-                             description="return all dataset items, next, previous don't appear in response",
+                             description="return all dataset items, next, previous don't appear in response, "
+                                         "JSON and NDJSON items are streamed",
                              required=False, type=OpenApiTypes.BOOL, default=False, ),
             OpenApiParameter(name='fields', description='comma separated list of fields', required=False,
                              type=OpenApiTypes.STR),
             OpenApiParameter(name='regions', description='comma separated list of regions', required=False,
                              type=OpenApiTypes.STR),
+            OpenApiParameter(name='pagination',
+                             description="cursor - keyset pagination by cursor, count doesn't appear in response",
+                             required=False, type=OpenApiTypes.STR, enum=('page', 'cursor'), default='page'),
+            OpenApiParameter(name='cursor', description='cursor from next or previous link', required=False,
+                             type=OpenApiTypes.STR),
 
         ]
     )
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'cache_key', None) and response.status_code == status.HTTP_200_OK and not response.streaming:
+            response.render()
+            cache.set(self.cache_key, (response.content, response['Content-Type']), settings.DATASET_CACHE_TIMEOUT)
+
+        return response
+
+    def get_version(self):
+        """
+        Versions of dataset data, which is bumped by mappers after every load, and of regions and datasets infos,
+        which are used to validate requests. ETag and response cache key depend on them,
+        so responses with stale data are never returned.
+        """
+        dataset_name = self.kwargs['dataset_name']
+        model_name = DatasetInfo.objects.filter(dataset_name=dataset_name).values_list('model_name', flat=True).first()
+        if model_name is None:
+            return None
+
+        model_names = [model_name, Region.__name__, DatasetInfo.__name__]
+        return [model_name, *TransformedDataVersion.get_versions(model_names), self.request.get_host()]
 
     def list(self, request, *args, **kwargs):
+        self.cache_key = f'dataset:{self.etag}' if self.etag else None
+        cached = cache.get(self.cache_key) if self.cache_key else None
+        if cached is not None:
+            self.cache_key = None
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
         self.validated_data = self.validate_query_params()
 
         queryset = self.filter_queryset(self.get_queryset())
         if not self.validated_data['all']:
             page = self.paginate_queryset(queryset)
             if page is not None:
+                if self.cursor_field_added:
+                    page = [{field: value for field, value in row.items() if field != 'id'} for row in page]
+                if request.accepted_renderer.format in COLUMNAR_ENCODERS:
+                    self.arrow_schema = self.get_page_arrow_schema(queryset)
                 return self.get_paginated_response(page)
 
+        if request.accepted_renderer.format in COLUMNAR_ENCODERS:
+            return self.get_columnar_response(queryset)
+
+        if request.accepted_renderer.format in STREAMING_ENCODERS:
+            return self.get_streaming_response(queryset)
+
         data = {
             'count': queryset.count(),
             'results': list(queryset),
         }
         return Response(data)
 
+    def get_streaming_response(self, queryset):
+        """
+        Encodes values_list rows while they are read by server side cursor, so whole dataset is never held in memory.
+        Streamed responses aren't cached, count of JSON is queried before rows to keep the same shape.
+        """
+        encoder, content_type = STREAMING_ENCODERS[self.request.accepted_renderer.format]
+        if encoder is iter_json:
+            encoder = partial(iter_json, count=queryset.count())
+        chunk_size = settings.DATASET_EXPORT_CHUNK_SIZE
+        fields = self._get_fields(queryset)
+        rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+        return StreamingHttpResponse(encoder(rows, fields, chunk_size), content_type=content_type)
+
+    def get_columnar_response(self, queryset):
+        """Streams record batches, which are built from values_list rows of server side cursor without dicts"""
+        encoder, content_type = COLUMNAR_ENCODERS[self.request.accepted_renderer.format]
+        chunk_size = settings.DATASET_EXPORT_CHUNK_SIZE
+        fields = self._get_fields(queryset)
+        schema = get_arrow_schema(queryset.model, fields)
+        rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+        batches = iter_record_batches(rows, schema, chunk_size)
+
+        return StreamingHttpResponse(encoder(batches, schema), content_type=content_type)
+
+    def get_page_arrow_schema(self, queryset):
+        fields = self._get_fields(queryset)
+        if self.cursor_field_added:
+            fields.remove('id')
+
+        return get_arrow_schema(queryset.model, fields)
+
+    def get_renderer_context(self):
+        """Columnar renderers build pages by schema of model fields, so empty pages and columns of nulls keep types"""
+        context = super().get_renderer_context()
+        context['arrow_schema'] = getattr(self, 'arrow_schema', None)
+        return context
+
+    @staticmethod
+    def _get_fields(queryset):
+        return list(queryset.query.values_select) or [field.attname for field in queryset.model._meta.concrete_fields]
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = DatasetCursorPagination() if self._is_cursor_pagination() else self.pagination_class()
+        return self._paginator
+
+    def _is_cursor_pagination(self):
+        return getattr(self, 'validated_data', {}).get('pagination') == 'cursor'
+
     def validate_query_params(self):
         params = self.request.query_params.dict()
         params.update(self.kwargs)
@@ -111,4 +252,10 @@ class Dataset(generics.ListAPIView):
         if self.validated_data['regions']:
             queryset = queryset.filter(region__in=self.validated_data['regions'])
 
-        return queryset.values(*self.validated_data['fields'])
+        fields = self.validated_data['fields']
+        # Cursor is built from id, so it's selected even if it isn't requested and removed from page after
+        self.cursor_field_added = bool(self._is_cursor_pagination() and fields and 'id' not in fields)
+        if self.cursor_field_added:
+            fields = [*fields, 'id']
+
+        return queryset.values(*fields)
@@ -1,11 +1,20 @@
 import csv
+import gzip
+import io
 import logging
+import os
+from collections import Counter
 from datetime import datetime
+from itertools import islice
 
+import numpy as np
+import pandas as pd
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from apps.etl.forms import CsvDataForm
+from apps.etl.models import CsvData, CsvImportCheckpoint
 from apps.etl.utils.logging import get_task_logger
 
 
@@ -13,19 +22,39 @@ class Command(BaseCommand):
     help = ("Downloads from csv file, \n args: string optional file_path")
 
     _csv_date_format = '%d/%m/%Y'
+    _csv_columns = {
+        'dateRep': 'date',
+        'cases': 'cases',
+        'deaths': 'deaths',
+        'Cumulative_number_for_14_days_of_COVID-19_cases_per_100000': 'per_100000_cases_for_2_weeks',
+    }
+    _int_range = (-2147483648, 2147483647)
+    _batch_size = 5000
 
     def add_arguments(self, parser):
         parser.add_argument("file_path", nargs='?', type=str, default=settings.DEFAULT_CSV_PATH)
+        parser.add_argument("bulk", nargs='?', type=int, choices=(0, 1), default=settings.CSV_BULK_IMPORT)
+        parser.add_argument("--rejects-path", dest='rejects_path', type=str, default=None)
+        parser.add_argument("--stream", action='store_true', default=False)
+        parser.add_argument("--batch-size", dest='batch_size', type=int, default=self._batch_size)
 
     def handle(self, *args, **options):
         self.file_path = options["file_path"]
+        self.rejects_path = options.get('rejects_path') or f'{self.file_path}.rejects.csv'
+        self.batch_size = options.get('batch_size') or self._batch_size
         self.prepare()
-        self.process_csv_data_to_db_model()
+        if options.get('stream'):
+            self.stream_process_csv_data_to_db_model()
+        elif options.get('bulk', settings.CSV_BULK_IMPORT):
+            self.bulk_process_csv_data_to_db_model()
+        else:
+            self.process_csv_data_to_db_model()
         self.summary()
 
     def prepare(self):
         self.imported_counter = 0
         self.skipped_counter = 0
+        self.errors_counter = Counter()
         self.logger = get_task_logger()
 
     def process_csv_data_to_db_model(self):
@@ -56,6 +85,139 @@ class Command(BaseCommand):
                     self.logger.log(logging.WARNING, 'Errors while import', **data, errors=errors, model='CsvData')
                     self.skipped_counter += 1
 
+    def bulk_process_csv_data_to_db_model(self):
+        """
+        Validates whole file columnar-wise and loads valid rows by bulk_create.
+        Rejected rows are written to rejects file with errors instead of logging each of them.
+        """
+        self.logger.log(logging.INFO, 'Bulk import from csv started')
+        self._remove_rejects()
+
+        df = pd.read_csv(self.file_path, usecols=list(self._csv_columns), dtype=str, keep_default_na=False)
+        objects, rejects = self._validate_frame(df, check_existing=True)
+        CsvData.objects.bulk_create(objects, batch_size=self.batch_size, ignore_conflicts=True)
+        self.imported_counter += len(objects)
+        self._write_rejects(rejects)
+
+        self._log_rejects()
+
+    def stream_process_csv_data_to_db_model(self):
+        """
+        Imports file by batches of rows with constant memory, every batch is upserted in its own transaction
+        together with checkpoint of read position, so interrupted import is resumed from the last batch.
+        Rows with line breaks inside quoted values are not supported.
+        """
+        path = os.path.abspath(self.file_path)
+        offset = CsvImportCheckpoint.get_offset(path)
+        self.logger.log(logging.INFO, 'Streaming import from csv started', offset=offset)
+        if not offset:
+            self._remove_rejects()
+
+        with self._open_csv(self.file_path) as f:
+            header = f.readline()
+            if offset:
+                self._skip_to(f, offset, len(header))
+            else:
+                offset = len(header)
+
+            while lines := list(islice(f, self.batch_size)):
+                offset += sum(map(len, lines))
+                df = pd.read_csv(io.BytesIO(header + b''.join(lines)), usecols=list(self._csv_columns), dtype=str,
+                                 keep_default_na=False)
+                objects, rejects = self._validate_frame(df, check_existing=False)
+
+                with transaction.atomic():
+                    CsvData.objects.bulk_create(
+                        objects, update_conflicts=True, unique_fields=['date'],
+                        update_fields=['cases', 'deaths', 'per_100000_cases_for_2_weeks'],
+                    )
+                    CsvImportCheckpoint.save_offset(path, offset)
+
+                self.imported_counter += len(objects)
+                self._write_rejects(rejects)
+
+        CsvImportCheckpoint.objects.filter(file_path=path).delete()
+        self._log_rejects()
+
+    @staticmethod
+    def _open_csv(file_path):
+        """Opens file as binary stream, compressed files are decompressed on the fly"""
+        if file_path.endswith('.gz'):
+            return gzip.open(file_path, 'rb')
+        if file_path.endswith('.zst'):
+            import zstandard
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb')))
+
+        return open(file_path, 'rb')
+
+    @staticmethod
+    def _skip_to(f, offset, position):
+        """Zstandard stream can't seek, so it's read up to offset by chunks, which are dropped"""
+        if f.seekable():
+            f.seek(offset)
+            return
+
+        remaining = offset - position
+        while remaining > 0 and (chunk := f.read(min(remaining, 1024 * 1024))):
+            remaining -= len(chunk)
+
+    def _validate_frame(self, df, check_existing):
+        df = df.rename(columns=self._csv_columns)[list(self._csv_columns.values())]
+        errors = pd.Series('', index=df.index)
+
+        dates = pd.to_datetime(df['date'], format=self._csv_date_format, errors='coerce')
+        errors = self._add_errors(errors, dates.isna(), 'date: invalid date')
+
+        columns = {}
+        for field in ('cases', 'deaths'):
+            values = pd.to_numeric(df[field], errors='coerce')
+            invalid = values.isna() | (values % 1 != 0) | ~values.between(*self._int_range)
+            errors = self._add_errors(errors, invalid, f'{field}: invalid integer')
+            columns[field] = values
+
+        per_100000 = pd.to_numeric(df['per_100000_cases_for_2_weeks'], errors='coerce')
+        invalid = per_100000.isna() & (df['per_100000_cases_for_2_weeks'].str.strip() != '')
+        errors = self._add_errors(errors, invalid, 'per_100000_cases_for_2_weeks: invalid number')
+
+        errors = self._add_errors(errors, dates.duplicated() & dates.notna(), 'date: duplicated in file')
+        if check_existing and dates.notna().any():
+            existing_dates = CsvData.objects.filter(date__range=(dates.min(), dates.max()))
+            existing = dates.dt.date.isin(set(existing_dates.values_list('date', flat=True)))
+            errors = self._add_errors(errors, existing, 'date: already exists')
+
+        valid = errors == ''
+        objects = [
+            CsvData(date=date, cases=int(cases), deaths=int(deaths),
+                    per_100000_cases_for_2_weeks=None if np.isnan(per_100000_cases) else per_100000_cases)
+            for date, cases, deaths, per_100000_cases in zip(
+                dates[valid].dt.date, columns['cases'][valid], columns['deaths'][valid], per_100000[valid]
+            )
+        ]
+        rejects = df[~valid].assign(errors=errors[~valid].str.lstrip('; '))
+
+        return objects, rejects
+
+    def _remove_rejects(self):
+        if os.path.exists(self.rejects_path):
+            os.remove(self.rejects_path)
+
+    def _write_rejects(self, rejects):
+        if rejects.empty:
+            return
+
+        rejects.to_csv(self.rejects_path, mode='a', index=False, header=not os.path.exists(self.rejects_path))
+        self.skipped_counter += len(rejects)
+        self.errors_counter.update(rejects['errors'])
+
+    def _log_rejects(self):
+        if self.skipped_counter:
+            self.logger.log(logging.WARNING, 'Errors while import', rejects_path=self.rejects_path,
+                            errors=dict(self.errors_counter), model='CsvData')
+
+    @staticmethod
+    def _add_errors(errors, mask, message):
+        return errors.mask(mask, errors + '; ' + message)
+
     def summary(self):
         self.logger.log(logging.INFO, 'Imported from csv', count=self.imported_counter)
         self.logger.log(logging.INFO, 'Skipped while csv import', count=self.skipped_counter)
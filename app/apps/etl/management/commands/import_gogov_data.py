@@ -5,14 +5,19 @@ from django.core.management.base import BaseCommand
 from apps.etl.models import GogovData
 from apps.etl.utils.parsers.gogov_parser import GogovParser
 from apps.etl.utils.logging import get_task_logger
+from apps.etl.utils.metrics import push_metrics
 
 
 class Command(BaseCommand):
     help = "imports data from gogov"
 
     def handle(self, *args, **options):
-        parsed_data = self.get_parsed_data()
-        self.upload_to_db(parsed_data)
+        try:
+            parsed_data = self.get_parsed_data()
+            if parsed_data:
+                self.upload_to_db(parsed_data)
+        finally:
+            push_metrics('import_gogov_data')
 
     def get_parsed_data(self):
         parser = GogovParser()
@@ -19,6 +19,5 @@ class Command(BaseCommand):
             regions = pickle.load(f)
 
         existing_regions = set(Region.objects.filter(name__in=regions).values_list('name', flat=True))
-        for region in filter(lambda x: x not in existing_regions, regions):
-            obj = Region.objects.create(name=region)
-            logger.log(logging.INFO, 'Region inserted', region_id=obj.id, name=obj.name)
+        objects = [Region.objects.create(name=region) for region in regions if region not in existing_regions]
+        logger.log_rows(logging.INFO, 'Region inserted', ({'region_id': obj.id, 'name': obj.name} for obj in objects))
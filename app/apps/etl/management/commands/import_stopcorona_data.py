@@ -1,55 +1,69 @@
 import logging
 
-from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import DatabaseError
+from django.db import transaction
 
-from apps.etl.models import StopCoronaData
+from apps.etl.models import StopCoronaArticle, StopCoronaData
 from apps.etl.utils.parsers.stopcorona_parser import StopCoronaParser
 from apps.etl.utils.logging import get_task_logger
+from apps.etl.utils.metrics import push_metrics
 
 
 class Command(BaseCommand):
     help = "imports data from объясняем.рф/stopcoronavirus"
+    batch_size = 500
 
     def add_arguments(self, parser):
         parser.add_argument("all", type=int, help='0-latest information, 1-full available information', choices=(0, 1),
                             default=0, nargs='?')
         parser.add_argument("manual", nargs='?', type=str, default=False)
+        parser.add_argument("--force", action='store_true', help='parse articles again, ignoring their crawl state')
 
     def handle(self, *args, **options):
         self.all = options["all"]
+        self.force = options["force"]
 
-        parsed_data = self.get_parsed_data()
-        created_count = self.upload_to_db(parsed_data)
+        created_count = 0
+        try:
+            for parsed_data, crawl_states in self.iter_parsed_data():
+                with transaction.atomic():
+                    created_count += self.upload_to_db(parsed_data)
+                    for crawl_state in crawl_states:
+                        StopCoronaArticle.save_crawl_state(*crawl_state)
+        finally:
+            push_metrics('import_stopcorona_data')
 
         if options['manual']:
             return bool(created_count)
 
-    def get_parsed_data(self):
-        parser = StopCoronaParser(all=self.all)
-        return parser.get_parsed_data()
+    def iter_parsed_data(self):
+        """
+        Yields parsed data by batches with crawl states of their articles, so they are uploaded while next articles
+        are parsed. Articles aren't split between batches, crawl state is saved only after all article data is uploaded.
+        """
+        batch, crawl_states = [], []
+        for crawl_state, regions_data in StopCoronaParser(all=self.all, force=self.force).iter_parsed_articles():
+            batch.extend(regions_data)
+            crawl_states.append(crawl_state)
+            if len(batch) >= self.batch_size:
+                yield batch, crawl_states
+                batch, crawl_states = [], []
+
+        if crawl_states:
+            yield batch, crawl_states
 
     def upload_to_db(self, data):
         logger = get_task_logger()
 
-        uploaded = set(StopCoronaData.objects.values_list('start_date', 'end_date', 'region'))
-        objects = [
-            StopCoronaData(**item) for item in data if
-            (item['start_date'], item['end_date'], item['region']) not in uploaded
-        ]
-
-        StopCoronaData.objects.bulk_create(objects, batch_size=500)
-
-        for obj in objects:
-            logger.log(logging.INFO,
-                       'StopCoronaData created',
-                       start_date=obj.start_date.strftime('%d-%m-%Y'),
-                       end_date=obj.end_date.strftime('%d-%m-%Y'),
-                       region=obj.region,
-                       hospitalized=obj.hospitalized,
-                       recovered=obj.recovered,
-                       infected=obj.infected,
-                       deaths=obj.deaths)
-
-            return len(objects)
+        objects = StopCoronaData.insert_new([StopCoronaData(**item) for item in data])
+
+        rows = ({'start_date': obj.start_date.strftime('%d-%m-%Y'),
+                 'end_date': obj.end_date.strftime('%d-%m-%Y'),
+                 'region': obj.region,
+                 'hospitalized': obj.hospitalized,
+                 'recovered': obj.recovered,
+                 'infected': obj.infected,
+                 'deaths': obj.deaths} for obj in objects)
+        logger.log_rows(logging.INFO, 'StopCoronaData created', rows)
+
+        return len(objects)
@@ -10,9 +10,10 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("debug", nargs='?', type=str, default=settings.DEBUG)
+        parser.add_argument("pushdown", nargs='?', type=int, choices=(0, 1), default=settings.LEGACY_SQL_PUSHDOWN)
 
     def handle(self, *args, **options):
-        data = LegacyGlobalDataTransformer.run()
+        data = LegacyGlobalDataTransformer.run(options['pushdown'])
         if options['debug']:
             GlobalTransformedDataMapper().map(data)
         else:
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('etl', '0014_alter_region_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransformedDataFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField()),
+                ('object_id', models.BigIntegerField()),
+                ('fingerprint', models.CharField(max_length=32)),
+            ],
+            options={
+                'unique_together': {('model_name', 'object_id')},
+            },
+        ),
+    ]
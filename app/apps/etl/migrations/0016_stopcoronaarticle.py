@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('etl', '0015_transformeddatafingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StopCoronaArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField(unique=True)),
+                ('etag', models.TextField(blank=True, null=True)),
+                ('last_modified', models.TextField(blank=True, null=True)),
+                ('content_hash', models.CharField(max_length=32)),
+                ('crawled_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
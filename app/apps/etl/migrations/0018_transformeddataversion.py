@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('etl', '0017_csvimportcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransformedDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField(unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
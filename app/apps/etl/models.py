@@ -1,5 +1,13 @@
-from django.db import models
-from django.db.models import Max
+from django.db import connection, models
+from django.db.models import Max, Min, Sum, Func, DateField
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+class WeekEnd(Func):
+    """Monday ending the week of the date, weeks are the same as in pandas resample('W-MON')"""
+    template = "(DATE_TRUNC('week', (%(expressions)s - 1)::timestamp) + INTERVAL '7 days')::date"
+    output_field = DateField()
 
 
 class ExternalDatabaseVaccination(models.Model):
@@ -29,6 +37,19 @@ class ExternalDatabaseVaccination(models.Model):
     def get_all_transform_data(cls):
         return cls.objects.using('external_covid').values('date', 'daily_people_vaccinated', 'daily_vaccinations')
 
+    @classmethod
+    def get_weekly_transform_data(cls, start_date=None, end_date=None):
+        query = cls.objects.using('external_covid')
+        if start_date:
+            query = query.filter(date__gte=start_date)
+        if end_date:
+            query = query.filter(date__lte=end_date)
+
+        return query.annotate(week_end=WeekEnd('date')).values('week_end').annotate(
+            weekly_people_vaccinated=Sum('daily_people_vaccinated'),
+            weekly_vaccinations=Sum('daily_vaccinations'),
+        ).order_by('week_end')
+
 
 class ExternalDatabaseStatistic(models.Model):
     date = models.DateField()
@@ -55,6 +76,27 @@ class ExternalDatabaseStatistic(models.Model):
 
         return cls.objects.using('external_covid').values(*values_list)
 
+    @classmethod
+    def get_weekly_transform_data(cls, with_region=False, after_date=None):
+        query = cls.objects.using('external_covid')
+        if after_date:
+            query = query.filter(date__gt=after_date)
+
+        values_list = ['region', 'week_end'] if with_region else ['week_end']
+        return query.annotate(week_end=WeekEnd('date')).values(*values_list).annotate(
+            weekly_deaths=Sum('death_per_day'),
+            weekly_infected=Sum('infection_per_day'),
+            weekly_recovered=Sum('recovery_per_day'),
+        ).order_by(*values_list)
+
+    @classmethod
+    def get_date_range(cls, after_date=None):
+        query = cls.objects.using('external_covid')
+        if after_date:
+            query = query.filter(date__gt=after_date)
+
+        return query.aggregate(start_date=Min('date'), end_date=Max('date'))
+
 
 class CsvData(models.Model):
     date = models.DateField(auto_now=False, unique=True)
@@ -67,8 +109,25 @@ class CsvData(models.Model):
         return cls.objects.values('date', 'cases', 'deaths')
 
 
+class CsvImportCheckpoint(models.Model):
+    """Position in decompressed csv file, up to which rows of interrupted streaming import were already saved"""
+    file_path = models.TextField(unique=True)
+    offset = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get_offset(cls, file_path):
+        checkpoint = cls.objects.filter(file_path=file_path).first()
+        return checkpoint.offset if checkpoint else 0
+
+    @classmethod
+    def save_offset(cls, file_path, offset):
+        cls.objects.update_or_create(file_path=file_path, defaults={'offset': offset})
+
+
 class StopCoronaData(models.Model):
     RUSSIAN_FEDERATION = 'Российская Федерация'
+    INSERT_BATCH_SIZE = 500
 
     start_date = models.DateField()
     end_date = models.DateField()
@@ -109,6 +168,50 @@ class StopCoronaData(models.Model):
         return query.order_by('start_date').values('start_date', 'end_date', 'region', 'infected', 'recovered',
                                                    'deaths')
 
+    @classmethod
+    def insert_new(cls, objects):
+        """
+        Inserts objects by INSERT ... ON CONFLICT DO NOTHING RETURNING and returns objects which were really inserted,
+        so duplicates are skipped by database without loading keys of the whole table.
+        Inserted objects are matched by natural key returned with id, so they aren't queried again.
+        """
+        if not objects:
+            return []
+
+        quote_name = connection.ops.quote_name
+        fields = [field for field in cls._meta.concrete_fields if not field.primary_key]
+        columns = ', '.join(quote_name(field.column) for field in fields)
+        key_fields = [cls._meta.get_field(field) for field in ('start_date', 'end_date', 'region')]
+        key_columns = ', '.join(quote_name(field.column) for field in key_fields)
+        # bulk_batch_size isn't limited on PostgreSQL, so batches are bounded to stay below bind parameters limit
+        batch_size = min(cls.INSERT_BATCH_SIZE, connection.ops.bulk_batch_size(fields, objects))
+
+        objects_by_key = {}
+        for obj in objects:
+            objects_by_key.setdefault(tuple(field.to_python(getattr(obj, field.attname)) for field in key_fields), obj)
+
+        inserted = []
+        with connection.cursor() as cursor:
+            for i in range(0, len(objects), batch_size):
+                batch = objects[i:i + batch_size]
+                values = ', '.join([f'({", ".join(["%s"] * len(fields))})'] * len(batch))
+                params = [field.get_db_prep_save(getattr(obj, field.attname), connection)
+                          for obj in batch for field in fields]
+                cursor.execute(
+                    f'INSERT INTO {quote_name(cls._meta.db_table)} ({columns}) VALUES {values} '
+                    f'ON CONFLICT ({key_columns}) DO NOTHING '
+                    f'RETURNING {quote_name(cls._meta.pk.column)}, {key_columns}',
+                    params,
+                )
+                for pk, *key in cursor.fetchall():
+                    obj = objects_by_key[tuple(field.to_python(value) for field, value in zip(key_fields, key))]
+                    obj.pk = pk
+                    obj._state.adding = False
+                    obj._state.db = connection.alias
+                    inserted.append(obj)
+
+        return sorted(inserted, key=lambda obj: obj.pk)
+
     @classmethod
     def get_earliest(cls):
         try:
@@ -128,6 +231,34 @@ class StopCoronaData(models.Model):
         return latest
 
 
+class StopCoronaArticle(models.Model):
+    """Crawl state of stopcorona weekly articles, which were already fetched and parsed"""
+    url = models.TextField(unique=True)
+    etag = models.TextField(null=True, blank=True)
+    last_modified = models.TextField(null=True, blank=True)
+    content_hash = models.CharField(max_length=32)
+    crawled_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get_crawl_states(cls):
+        return {article.url: article for article in cls.objects.all()}
+
+    @classmethod
+    def save_crawl_state(cls, url, etag, last_modified, content_hash):
+        cls.objects.update_or_create(
+            url=url, defaults={'etag': etag, 'last_modified': last_modified, 'content_hash': content_hash}
+        )
+
+    def get_conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
 class GogovData(models.Model):
     date = models.DateField(unique=True)
     first_component = models.IntegerField()
@@ -258,5 +389,56 @@ class RegionTransformedData(models.Model):
         return {itm['region']: itm for itm in items}
 
 
+class TransformedDataFingerprint(models.Model):
+    """Hashes of transformed data rows update fields, used by mappers to skip unchanged rows"""
+    model_name = models.TextField()
+    object_id = models.BigIntegerField()
+    fingerprint = models.CharField(max_length=32)
+
+    class Meta:
+        unique_together = ['model_name', 'object_id', ]
+
+    @classmethod
+    def get_fingerprints(cls, model, ids):
+        query = cls.objects.filter(model_name=model.__name__, object_id__in=ids)
+        return dict(query.values_list('object_id', 'fingerprint'))
+
+
+class TransformedDataVersion(models.Model):
+    """
+    Version of data served by API, bumped by mappers after every load which changed transformed data
+    and on every write of small reference models, like regions
+    """
+    model_name = models.TextField(unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def get_version(cls, model_name):
+        return cls.objects.filter(model_name=model_name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def get_versions(cls, model_names):
+        versions = dict(cls.objects.filter(model_name__in=model_names).values_list('model_name', 'version'))
+        return [versions.get(model_name, 0) for model_name in model_names]
+
+    @classmethod
+    def bump(cls, model):
+        """Bumps version by single upsert, so concurrent bumps aren't lost when the row doesn't exist yet"""
+        quote_name = connection.ops.quote_name
+        table = quote_name(cls._meta.db_table)
+        model_name, version = (quote_name(cls._meta.get_field(field).column) for field in ('model_name', 'version'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({model_name}, {version}) VALUES (%s, 1) '
+                f'ON CONFLICT ({model_name}) DO UPDATE SET {version} = {table}.{version} + 1',
+                [model.__name__],
+            )
+
+
 class Region(models.Model):
     name = models.TextField(unique=True)
+
+
+@receiver([post_save, post_delete], sender=Region)
+def bump_region_version(sender, **kwargs):
+    TransformedDataVersion.bump(sender)
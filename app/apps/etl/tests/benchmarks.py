@@ -0,0 +1,38 @@
+"""
+Benchmarks, which aren't run with tests, e.g.:
+python manage.py test apps.etl.tests.benchmarks
+"""
+import timeit
+from datetime import date
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.etl.tests.mocks import LoggerMock, StopCoronaArticleMock
+from apps.etl.utils.parsers.stopcorona_parser import StopCoronaParser
+
+
+@patch("apps.etl.utils.logging.Logger", LoggerMock)
+@patch("apps.etl.models.StopCoronaArticle.get_crawl_states", dict)
+class StopCoronaParserBenchmark(SimpleTestCase):
+    repeat = 20
+
+    def test_parse_page(self):
+        parser = StopCoronaParser()
+        pages = StopCoronaArticleMock.get_pages()
+
+        for name, parse_page in (('lxml', parser._parse_page), ('html5lib', parser._parse_page_html5lib)):
+            elapsed = timeit.timeit(lambda: [parse_page(page) for page in pages], number=self.repeat)
+            print(f'{name}: {elapsed / self.repeat / len(pages) * 1000:.2f} ms per article')
+
+    def test_decode_table(self):
+        dates = [date(2023, 10, 23), date(2023, 10, 29)]
+        _, table_data = StopCoronaParser._extract_page_data(StopCoronaArticleMock.get_page())
+        rows_count = len(table_data) // 5 - 1
+        repeat = self.repeat * 10
+
+        elapsed = timeit.timeit(
+            lambda: StopCoronaParser._get_regions_data(StopCoronaParser._clean_table_texts(table_data), dates),
+            number=repeat,
+        )
+        print(f'table decoding: {rows_count * repeat / elapsed:.0f} rows per second')
@@ -1,3 +1,23 @@
+from datetime import date, timedelta
+
+
+def _get_week_end(day):
+    day = date.fromisoformat(day)
+    return day + timedelta(days=(7 - day.weekday()) % 7)
+
+
+def _sum_by_weeks(data, key_fields, fields_map):
+    weeks = {}
+    for item in data:
+        key = (*(item[field] for field in key_fields), _get_week_end(item['date']))
+        week = weeks.setdefault(key, {**{field: item[field] for field in key_fields}, 'week_end': key[-1],
+                                      **{weekly_field: 0 for weekly_field in fields_map}})
+        for weekly_field, field in fields_map.items():
+            week[weekly_field] += item[field]
+
+    return [weeks[key] for key in sorted(weeks)]
+
+
 class ExternalDatabaseStatisticMock:
     @classmethod
     def get_all_transform_data(cls, with_region=False):
@@ -157,6 +177,20 @@ class ExternalDatabaseStatisticMock:
 
         return mock
 
+    @classmethod
+    def get_weekly_transform_data(cls, with_region=False, after_date=None):
+        data = [item for item in cls.get_all_transform_data(with_region)
+                if not after_date or date.fromisoformat(item['date']) > after_date]
+        fields_map = {'weekly_deaths': 'death_per_day', 'weekly_infected': 'infection_per_day',
+                      'weekly_recovered': 'recovery_per_day'}
+        return _sum_by_weeks(data, ['region'] if with_region else [], fields_map)
+
+    @classmethod
+    def get_date_range(cls, after_date=None):
+        dates = [date.fromisoformat(item['date']) for item in cls.get_all_transform_data()]
+        dates = [day for day in dates if not after_date or day > after_date]
+        return {'start_date': min(dates, default=None), 'end_date': max(dates, default=None)}
+
 
 class ExternalDatabaseVaccinationMock:
     @classmethod
@@ -201,6 +235,74 @@ class ExternalDatabaseVaccinationMock:
 
         return mock
 
+    @classmethod
+    def get_weekly_transform_data(cls, start_date=None, end_date=None):
+        data = [item for item in cls.get_all_transform_data()
+                if (not start_date or date.fromisoformat(item['date']) >= start_date)
+                and (not end_date or date.fromisoformat(item['date']) <= end_date)]
+        fields_map = {'weekly_people_vaccinated': 'daily_people_vaccinated',
+                      'weekly_vaccinations': 'daily_vaccinations'}
+        return _sum_by_weeks(data, [], fields_map)
+
+
+class StopCoronaArticleMock:
+    """Weekly report article in the same markup as on stopcorona site"""
+    _federal_districts = ('Центральный федеральный округ', 'Северо-Западный федеральный округ',
+                          'Южный федеральный округ', 'Приволжский федеральный округ')
+    _regions = ('Москва', 'Санкт-Петербург', 'Московская обл.', 'Ульяновская обл.', 'Самарская обл.',
+                'Республика Татарстан', 'Республика Карелия', 'Томская область', 'Ямало-Ненецкий автономный округ',
+                'Еврейская автономная область')
+
+    @classmethod
+    def get_page(cls, dates_text='(23.10 - 29.10.2023)', regions_count=85):
+        rows = []
+        for i in range(regions_count + len(cls._federal_districts)):
+            if i % 22 == 0 and i // 22 < len(cls._federal_districts):
+                region = cls._federal_districts[i // 22]
+            else:
+                region = f'{cls._regions[i % len(cls._regions)]}{"" if i < len(cls._regions) else f" {i}"}'
+
+            rows.append(
+                f'<tr><td><p>{region}</p></td><td>{i * 7}</td><td>{i * 1013 % 9000} </td>'
+                f'<td>{i * 3 + 1} {i % 1000:03}</td><td>{i % 13}</td></tr>'
+            )
+
+        navigation = ''.join(f'<li class="menu__item"><a href="/stopkoronavirus/page-{i}/">Раздел {i}</a></li>'
+                             for i in range(60))
+        return f"""
+            <!DOCTYPE html>
+            <html lang="ru">
+            <head><meta charset="utf-8"><title>В России за неделю выздоровело</title></head>
+            <body>
+                <header><nav><ul class="menu">{navigation}</ul></nav></header>
+                <main>
+                    <div class="article-detail">
+                        <div class="article-detail__body">
+                            <p>Оперативные данные по регионам.</p>
+                            <h3> По состоянию за 44 нед. 2023 г. {dates_text}</h3>
+                            <table>
+                                <tbody>
+                                    <tr><td>Наименование субъекта</td><td>Госпитализировано</td>
+                                    <td>Выздоровело</td><td>Заболело</td><td>Умерло</td></tr>
+                                    {''.join(rows)}
+                                </tbody>
+                            </table>
+                        </div>
+                    </div>
+                </main>
+                <footer><ul class="menu">{navigation}</ul></footer>
+            </body>
+            </html>
+        """
+
+    @classmethod
+    def get_pages(cls):
+        return [
+            cls.get_page(),
+            cls.get_page('(30.10.2023 - 05.11.2023)'),
+            cls.get_page('(06.11. - 12.11.2023)', regions_count=40),
+        ]
+
 
 class LoggerMock():
     def __init__(self, *args, **kwargs):
@@ -208,3 +310,6 @@ class LoggerMock():
 
     def log(self, *args, **kwargs):
         pass
+
+    def log_rows(self, *args, **kwargs):
+        pass
@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.test import TestCase
+from numpy import nan
+
+from apps.etl.models import CsvData, StopCoronaData
+from apps.etl.utils.dataframes import read_dataframe
+
+
+class ReadDataframeTestCase(TestCase):
+    def setUp(self):
+        CsvData.objects.create(date=date(2020, 12, 12), cases=28585, deaths=613)
+        CsvData.objects.create(date=date(2020, 12, 13), cases=28137, deaths=560)
+        CsvData.objects.create(date=date(2020, 12, 14), cases=28080, deaths=None)
+
+    def test_read_queryset(self):
+        df = read_dataframe(CsvData.objects.order_by('date').values('date', 'cases', 'deaths'), chunk_size=2)
+
+        self.assertListEqual(['date', 'cases', 'deaths'], list(df.columns))
+        self.assertListEqual(['datetime64[ns]', 'int64', 'float64'], [str(dtype) for dtype in df.dtypes])
+
+        estimated_data = [
+            {'date': date(2020, 12, 12), 'cases': 28585, 'deaths': 613},
+            {'date': date(2020, 12, 13), 'cases': 28137, 'deaths': 560},
+            {'date': date(2020, 12, 14), 'cases': 28080, 'deaths': None},
+        ]
+        df['date'] = df['date'].dt.date
+        df.replace({nan: None}, inplace=True)
+        self.assertListEqual(estimated_data, df.to_dict('records'))
+
+    def test_read_empty_queryset(self):
+        df = read_dataframe(StopCoronaData.objects.values('start_date', 'region', 'infected'))
+
+        self.assertTrue(df.empty)
+        self.assertListEqual(['start_date', 'region', 'infected'], list(df.columns))
+        self.assertListEqual(['datetime64[ns]', 'object', 'int64'], [str(dtype) for dtype in df.dtypes])
+
+    def test_read_list(self):
+        data = [{'date': '2020-12-13', 'cases': 1}, {'date': '2020-12-14', 'cases': 2}]
+
+        df = read_dataframe(data)
+
+        self.assertListEqual(data, df.to_dict('records'))
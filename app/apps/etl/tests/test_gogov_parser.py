@@ -1,9 +1,10 @@
+import tempfile
 from datetime import datetime
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 
 from bs4 import BeautifulSoup
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from apps.etl.utils.parsers.gogov_parser import convert_str_to_date, GogovParser
 
@@ -39,6 +40,19 @@ class GogovTestCase(TestCase):
 
         self.assertIsNone(result)
 
+    @patch('requests.get')
+    def test__get_page_html_not_modified(self, mock_get):
+        mock_get.side_effect = [
+            Mock(status_code=200, text='<html>Some HTML response</html>', headers={'ETag': '"v1"'}),
+            Mock(status_code=304, text='', headers={}),
+        ]
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(HTTP_CACHE_DIR=cache_dir):
+            self.assertEqual('<html>Some HTML response</html>', GogovParser._get_page_html())
+            self.assertEqual('<html>Some HTML response</html>', GogovParser._get_page_html())
+
+        self.assertEqual('"v1"', mock_get.call_args.kwargs['headers']['If-None-Match'])
+
     @patch('requests.get')
     def test__get_page_html_non_200_status_code(self, mock_get):
         mock_get.return_value.status_code = 404
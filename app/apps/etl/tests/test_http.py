@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+
+from django.test import TestCase, override_settings
+
+from apps.etl.utils.http import HttpCache, HTTP_CACHE_REQUESTS
+from apps.etl.utils.metrics import push_metrics
+
+
+class HttpCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = HttpCache(self.cache_dir.name, 1024)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    @staticmethod
+    def _get_response(status_code, text='', headers=None):
+        return Mock(status_code=status_code, text=text, headers=headers or {})
+
+    @staticmethod
+    def _get_requests_count(result):
+        return HTTP_CACHE_REQUESTS.labels(host='example.com', result=result)._value.get()
+
+    def test_get_not_modified(self):
+        hits, misses = self._get_requests_count('hit'), self._get_requests_count('miss')
+        fetch = Mock(side_effect=[
+            self._get_response(200, '<html>page</html>', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024'}),
+            self._get_response(304),
+        ])
+
+        response = self.cache.get('https://example.com/page', fetch, headers={'User-agent': 'Mozilla/5.0'})
+        self.assertFalse(response.not_modified)
+        self.assertEqual('<html>page</html>', response.text)
+
+        response = self.cache.get('https://example.com/page', fetch, headers={'User-agent': 'Mozilla/5.0'})
+        self.assertTrue(response.not_modified)
+        self.assertEqual('<html>page</html>', response.text)
+
+        self.assertDictEqual({'User-agent': 'Mozilla/5.0', 'If-None-Match': '"v1"',
+                              'If-Modified-Since': 'Mon, 01 Jan 2024'}, fetch.call_args.kwargs['headers'])
+        self.assertEqual(hits + 1, self._get_requests_count('hit'))
+        self.assertEqual(misses + 1, self._get_requests_count('miss'))
+
+    def test_get_without_validators(self):
+        fetch = Mock(return_value=self._get_response(200, '<html>page</html>'))
+
+        self.cache.get('https://example.com/page', fetch)
+        response = self.cache.get('https://example.com/page', fetch)
+
+        self.assertFalse(response.not_modified)
+        self.assertDictEqual({}, fetch.call_args.kwargs['headers'])
+        self.assertListEqual([], os.listdir(self.cache_dir.name))
+
+    def test_evict_least_recently_used(self):
+        fetch = Mock(return_value=self._get_response(200, 'a' * 400, {'ETag': '"v1"'}))
+
+        self.cache.get('https://example.com/1', fetch)
+        self.cache.get('https://example.com/2', fetch)
+        os.utime(self.cache._get_entry_path('https://example.com/1'), (0, 0))
+        self.cache.get('https://example.com/3', fetch)
+
+        self.assertIsNone(self.cache._read_entry('https://example.com/1'))
+        self.assertIsNotNone(self.cache._read_entry('https://example.com/2'))
+        self.assertIsNotNone(self.cache._read_entry('https://example.com/3'))
+
+
+class StubPushgatewayHandler(BaseHTTPRequestHandler):
+    pushes = []
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.pushes.append((self.path, body.decode()))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PushMetricsTestCase(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubPushgatewayHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        StubPushgatewayHandler.pushes = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_push_metrics(self):
+        HTTP_CACHE_REQUESTS.labels(host='example.com', result='hit').inc()
+
+        with override_settings(PROMETHEUS_PUSHGATEWAY=f'127.0.0.1:{self.server.server_port}'):
+            push_metrics('import_test_data')
+
+        path, body = StubPushgatewayHandler.pushes[0]
+        self.assertEqual('/metrics/job/import_test_data', path)
+        self.assertIn('etl_http_cache_requests_total{host="example.com",result="hit"}', body)
+
+    def test_push_metrics_without_pushgateway(self):
+        with override_settings(PROMETHEUS_PUSHGATEWAY=None):
+            push_metrics('import_test_data')
+
+        self.assertListEqual([], StubPushgatewayHandler.pushes)
@@ -1,12 +1,15 @@
 import csv
+import gzip
 import os
+from datetime import date
 from unittest import mock
 
+import zstandard
 from django.test import TestCase
 from django.conf import settings
 
 from apps.etl.management.commands.import_covid_statistics_from_csv import Command
-from apps.etl.models import CsvData
+from apps.etl.models import CsvData, CsvImportCheckpoint
 from apps.etl.tests.mocks import LoggerMock
 
 
@@ -52,5 +55,97 @@ class ImportDataTests(TestCase):
         self.assertTrue(
             CsvData.objects.filter(date='2023-11-20', cases=200, deaths=20, per_100000_cases_for_2_weeks=25.8).exists())
 
+    @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_csv_bulk_loading(self):
+        CsvData.objects.create(date=date(2023, 11, 20), cases=1, deaths=1)
+        with open(self._test_file_path, 'a', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([4, '19/11/2023', '150', '15', ''])
+            writer.writerow([5, '31/11/2023', '1.5', '25', ''])
+            writer.writerow([6, '22/11/2023', '300', '30', ''])
+
+        Command().handle(file_path=self._test_file_path, bulk=1)
+
+        self.assertListEqual(
+            [
+                (date(2023, 11, 18), 100, 488, 263.66356427),
+                (date(2023, 11, 19), 150, 15, 20.2),
+                (date(2023, 11, 20), 1, 1, None),
+                (date(2023, 11, 22), 300, 30, None),
+            ],
+            list(CsvData.objects.order_by('date').values_list('date', 'cases', 'deaths',
+                                                              'per_100000_cases_for_2_weeks')),
+        )
+
+        with open(f'{self._test_file_path}.rejects.csv', newline='') as rejects_file:
+            rejects = [(row['date'], row['errors']) for row in csv.DictReader(rejects_file)]
+        os.remove(f'{self._test_file_path}.rejects.csv')
+
+        self.assertListEqual(
+            [
+                ('20/11/2023', 'date: already exists'),
+                ('21/11/2023', 'per_100000_cases_for_2_weeks: invalid number'),
+                ('19/11/2023', 'date: duplicated in file'),
+                ('31/11/2023', 'date: invalid date; cases: invalid integer'),
+            ],
+            rejects,
+        )
+
+    @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_csv_stream_loading_resumes_after_failure(self):
+        gzip_file_path = f'{self._test_file_path}.gz'
+        with open(self._test_file_path, 'rb') as csvfile, gzip.open(gzip_file_path, 'wb') as gzip_file:
+            gzip_file.write(csvfile.read())
+
+        self._test_stream_loading_resumes_after_failure(gzip_file_path)
+
+    @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_zstd_csv_stream_loading_resumes_after_failure(self):
+        zstd_file_path = f'{self._test_file_path}.zst'
+        with open(self._test_file_path, 'rb') as csvfile, open(zstd_file_path, 'wb') as zstd_file:
+            zstd_file.write(zstandard.ZstdCompressor().compress(csvfile.read()))
+
+        self._test_stream_loading_resumes_after_failure(zstd_file_path)
+
+    def _test_stream_loading_resumes_after_failure(self, file_path):
+        CsvData.objects.create(date=date(2023, 11, 20), cases=1, deaths=1)
+
+        validate_frame = Command._validate_frame
+        calls = []
+
+        def fail_on_second_batch(command, df, check_existing):
+            calls.append(len(df))
+            if len(calls) == 2:
+                raise RuntimeError
+            return validate_frame(command, df, check_existing)
+
+        with mock.patch.object(Command, '_validate_frame', autospec=True, side_effect=fail_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                Command().handle(file_path=file_path, stream=True, batch_size=2)
+
+        self.assertListEqual([date(2023, 11, 18), date(2023, 11, 19), date(2023, 11, 20)],
+                             list(CsvData.objects.order_by('date').values_list('date', flat=True)))
+        self.assertTrue(CsvImportCheckpoint.get_offset(os.path.abspath(file_path)) > 0)
+
+        Command().handle(file_path=file_path, stream=True, batch_size=2)
+
+        self.assertListEqual(
+            [
+                (date(2023, 11, 18), 100, 488, 263.66356427),
+                (date(2023, 11, 19), 150, 15, 20.2),
+                (date(2023, 11, 20), 200, 20, 25.8),
+            ],
+            list(CsvData.objects.order_by('date').values_list('date', 'cases', 'deaths',
+                                                              'per_100000_cases_for_2_weeks')),
+        )
+        self.assertFalse(CsvImportCheckpoint.objects.exists())
+
+        with open(f'{file_path}.rejects.csv', newline='') as rejects_file:
+            rejects = [(row['date'], row['errors']) for row in csv.DictReader(rejects_file)]
+        os.remove(f'{file_path}.rejects.csv')
+        os.remove(file_path)
+
+        self.assertListEqual([('21/11/2023', 'per_100000_cases_for_2_weeks: invalid number')], rejects)
+
     def tearDown(self):
         os.remove(self._test_file_path)
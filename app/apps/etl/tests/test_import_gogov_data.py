@@ -1,6 +1,9 @@
-from unittest.mock import patch
+import tempfile
+from unittest.mock import Mock, patch
 
-from django.test import TestCase
+from django.conf import settings
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 from apps.etl.models import GogovData
 from apps.etl.management.commands.import_gogov_data import Command
 from apps.etl.utils.parsers.gogov_parser import GogovParser
@@ -32,3 +35,21 @@ class TestImportGogovData(TestCase):
         global_data_obj = GogovData.objects.get()
         self.assertEqual(global_data_obj.first_component, global_data['first_component'])
         self.assertEqual(global_data_obj.second_component, global_data['second_component'])
+
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    @patch("requests.get")
+    def test_handle_not_modified_after_failed_upload(self, mock_get):
+        with open(settings.BASE_DIR.joinpath('apps/etl/tests_data/global_region_data.text'), encoding='cp1251') as file:
+            page = file.read()
+        mock_get.side_effect = [
+            Mock(status_code=200, text=page, headers={'ETag': '"v1"'}),
+            Mock(status_code=304, text='', headers={}),
+        ]
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(HTTP_CACHE_DIR=cache_dir):
+            with patch.object(Command, 'upload_to_db', side_effect=DatabaseError('upload failed')), \
+                    self.assertRaises(DatabaseError):
+                Command().handle()
+            Command().handle()
+
+        self.assertEqual(89081596, GogovData.objects.get().first_component)
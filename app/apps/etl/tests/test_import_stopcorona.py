@@ -1,10 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 from unittest.mock import patch
 
+from django.db import DatabaseError
 from django.test import TestCase
 
 from apps.etl.management.commands.import_stopcorona_data import Command
-from apps.etl.models import StopCoronaData
+from apps.etl.models import StopCoronaArticle, StopCoronaData
 from apps.etl.tests.mocks import LoggerMock
 
 
@@ -72,7 +73,101 @@ class ImportStopcoronaDataTestCase(TestCase):
 
         count = StopCoronaData.objects.count()
         сommand = Command()
-        сommand.upload_to_db(data)
+        created_count = сommand.upload_to_db(data)
+        self.assertEqual(0, created_count)
         self.assertEqual(count, StopCoronaData.objects.count())
 
         StopCoronaData.objects.filter(region='Region 1').delete()
+
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_upload_to_db_returns_only_inserted(self):
+        StopCoronaData.objects.create(start_date='2022-01-01', end_date='2022-01-09', region='Region 1',
+                                      hospitalized=10, infected=100, recovered=50, deaths=5)
+        data = [{
+            'start_date': datetime.strptime('01.01.2022', '%d.%m.%Y').date(),
+            'end_date': datetime.strptime('09.01.2022', '%d.%m.%Y').date(),
+            'region': region,
+            'hospitalized': 10,
+            'infected': 100,
+            'recovered': 50,
+            'deaths': 5} for region in ('Region 1', 'Region 2', 'Region 2', 'Region 3')]
+
+        with patch("apps.etl.management.commands.import_stopcorona_data.get_task_logger") as get_task_logger:
+            created_count = Command().upload_to_db(data)
+
+        self.assertEqual(2, created_count)
+        self.assertListEqual(['Region 2', 'Region 3'],
+                             [row['region'] for row in get_task_logger.return_value.log_rows.call_args.args[2]])
+        self.assertEqual(3, StopCoronaData.objects.filter(start_date='2022-01-01').count())
+
+    def test_insert_new_in_single_query(self):
+        StopCoronaData.objects.create(start_date='2022-01-01', end_date='2022-01-09', region='Region 1',
+                                      hospitalized=10, infected=100, recovered=50, deaths=5)
+        objects = [StopCoronaData(start_date=date(2022, 1, 1), end_date=date(2022, 1, 9), region=region,
+                                  hospitalized=10, infected=100, recovered=50, deaths=5)
+                   for region in ('Region 3', 'Region 1', 'Region 2')]
+
+        with self.assertNumQueries(1):
+            inserted = StopCoronaData.insert_new(objects)
+
+        self.assertListEqual([objects[0], objects[2]], inserted)
+        self.assertListEqual(
+            [(obj.pk, obj.region) for obj in inserted],
+            list(StopCoronaData.objects.filter(pk__in=[obj.pk for obj in inserted]).order_by('pk')
+                 .values_list('pk', 'region')),
+        )
+
+    @patch.object(StopCoronaData, 'INSERT_BATCH_SIZE', 2)
+    def test_insert_new_by_batches(self):
+        objects = [StopCoronaData(start_date=date(2022, 1, 1), end_date=date(2022, 1, 9), region=f'Region {i}',
+                                  hospitalized=10, infected=100, recovered=50, deaths=5)
+                   for i in range(5)]
+
+        with self.assertNumQueries(3):
+            inserted = StopCoronaData.insert_new(objects)
+
+        self.assertListEqual(objects, inserted)
+        self.assertEqual(5, StopCoronaData.objects.filter(pk__in=[obj.pk for obj in inserted]).count())
+
+    @staticmethod
+    def _get_parsed_articles(count):
+        return [((f'article-{i}', None, None, f'hash-{i}'), [{
+            'start_date': datetime.strptime('23.10.2023', '%d.%m.%Y').date(),
+            'end_date': datetime.strptime('29.10.2023', '%d.%m.%Y').date(),
+            'region': f'Region {i}',
+            'hospitalized': 10,
+            'recovered': 5,
+            'infected': 20,
+            'deaths': 2}]) for i in range(count)]
+
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_handle_uploads_by_batches(self):
+        articles = self._get_parsed_articles(5)
+
+        сommand = Command()
+        сommand.batch_size = 2
+        with patch("apps.etl.management.commands.import_stopcorona_data.StopCoronaParser") as parser, \
+                patch.object(Command, 'upload_to_db', autospec=True, side_effect=Command.upload_to_db) as upload_to_db:
+            parser.return_value.iter_parsed_articles.return_value = iter(articles)
+            updated = сommand.handle(all=1, manual=True, force=False)
+
+        self.assertTrue(updated)
+        self.assertListEqual([2, 2, 1], [len(call.args[1]) for call in upload_to_db.call_args_list])
+        self.assertEqual(5, StopCoronaData.objects.filter(start_date=articles[0][1][0]['start_date']).count())
+        self.assertEqual(5, StopCoronaArticle.objects.count())
+
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_handle_saves_crawl_state_after_upload(self):
+        articles = self._get_parsed_articles(4)
+
+        сommand = Command()
+        сommand.batch_size = 2
+        with patch("apps.etl.management.commands.import_stopcorona_data.StopCoronaParser") as parser, \
+                patch.object(Command, 'upload_to_db', autospec=True,
+                             side_effect=[2, DatabaseError('upload failed')]):
+            parser.return_value.iter_parsed_articles.return_value = iter(articles)
+            with self.assertRaises(DatabaseError):
+                сommand.handle(all=0, manual=True, force=False)
+
+        self.assertListEqual(['article-0', 'article-1'],
+                             list(StopCoronaArticle.objects.order_by('url').values_list('url', flat=True)))
@@ -0,0 +1,74 @@
+import logging
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase
+
+from apps.etl.utils.logging import BatchingLokiHandler, Logger
+
+
+class LoggerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.rows = [{'region': f'Region {i}', 'infected': i} for i in range(4)]
+
+    def test_log_rows(self):
+        logger = Mock()
+
+        Logger(logger).log_rows(logging.INFO, 'Parsed', iter(self.rows), model='Test')
+
+        self.assertListEqual(
+            [{'message': 'Parsed', **row, 'model': 'Test'} for row in self.rows],
+            [call.args[1] for call in logger.log.call_args_list],
+        )
+
+    def test_log_rows_summary(self):
+        logger = Mock()
+
+        Logger(logger, summary=True, sample_size=2).log_rows(logging.INFO, 'Parsed', iter(self.rows), model='Test')
+        Logger(logger, summary=True, sample_size=2).log_rows(logging.INFO, 'Parsed', iter([]))
+
+        logger.log.assert_called_once_with(
+            logging.INFO, {'message': 'Parsed', 'count': 4, 'samples': self.rows[:2], 'model': 'Test'}
+        )
+
+
+class BatchingLokiHandlerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.handler = BatchingLokiHandler('http://loki/loki/api/v1/push', tags={'app': 'test'}, batch_size=3,
+                                           flush_interval=60)
+        self.handler.emitter._session = Mock(post=Mock(return_value=Mock(status_code=204)))
+        self.post = self.handler.emitter._session.post
+        self.logger = logging.getLogger('test_batching_loki_handler')
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def _get_pushed_lines(self):
+        return [
+            [[value[1] for value in stream['values']] for stream in call.kwargs['json']['streams']]
+            for call in self.post.call_args_list
+        ]
+
+    def test_push_by_batches(self):
+        for i in range(7):
+            self.logger.warning('record %s', i)
+
+        self.handler.flush()
+
+        self.assertListEqual(
+            [[['record 0', 'record 1', 'record 2']], [['record 3', 'record 4', 'record 5']], [['record 6']]],
+            self._get_pushed_lines(),
+        )
+        self.assertEqual({'app': 'test', 'severity': 'warning', 'logger': 'test_batching_loki_handler'},
+                         self.post.call_args.kwargs['json']['streams'][0]['stream'])
+
+    def test_push_streams_by_labels(self):
+        self.logger.warning('warning')
+        self.logger.error('error')
+        self.logger.warning('another warning')
+
+        self.handler.close()
+
+        self.assertListEqual([[['warning', 'another warning'], ['error']]], self._get_pushed_lines())
@@ -1,10 +1,13 @@
 import datetime
 from copy import deepcopy
+from unittest import skipUnless
 from unittest.mock import patch
 
+from django.db import connection
 from django.test import TestCase
 
-from apps.etl.models import GlobalTransformedData, RegionTransformedData
+from apps.etl.models import (GlobalTransformedData, RegionTransformedData, TransformedDataFingerprint,
+                             TransformedDataVersion)
 from apps.etl.utils.mappers.transformed_data_mappers import RegionTransformedDataMapper, GlobalTransformedDataMapper
 from apps.etl.tests.mocks import LoggerMock
 
@@ -65,28 +68,75 @@ class TransformedDataMapperBaseTestCase(TestCase):
         item_key = mapper._get_item_key(self.data[3])
         self.assertSequenceEqual((self.data[3]['start_date'], self.data[3]['end_date']), item_key)
 
-    def test__update_existing(self):
-        existing = GlobalTransformedData.objects.create(**self.data[0])
-
-        def check_fields_equality():
-            for field in GlobalTransformedDataMapper._update_fields:
-                self.assertEqual(getattr(existing, field), self.data[0][field])
+    def test__is_changed(self):
+        GlobalTransformedData.objects.create(**self.data[0])
+        mapper = GlobalTransformedDataMapper()
 
-        updated = GlobalTransformedDataMapper()._update_existing(existing, self.data[0])
-        self.assertFalse(updated)
-        check_fields_equality()
+        existing_row = mapper._get_existing_rows(self.data[:1])[mapper._get_item_key(self.data[0])]
+        self.assertFalse(mapper._is_changed(existing_row, self.data[0]))
 
         self.data[0]['weekly_recovered'] = 504
-        updated = GlobalTransformedDataMapper()._update_existing(existing, self.data[0])
-        self.assertTrue(updated)
-        check_fields_equality()
+        self.assertTrue(mapper._is_changed(existing_row, self.data[0]))
 
         for field in GlobalTransformedDataMapper._update_fields:
             self.data[0][field] = 1337
 
-        updated = GlobalTransformedDataMapper()._update_existing(existing, self.data[0])
-        self.assertTrue(updated)
-        check_fields_equality()
+        self.assertTrue(mapper._is_changed(existing_row, self.data[0]))
+
+    def test__is_changed_float_tolerance(self):
+        GlobalTransformedData.objects.create(**self.data[1])
+        mapper = GlobalTransformedDataMapper()
+        existing_row = mapper._get_existing_rows(self.data[1:2])[mapper._get_item_key(self.data[1])]
+
+        self.data[1]['weekly_infected_per_100000'] += 1e-12
+        self.assertFalse(mapper._is_changed(existing_row, self.data[1]))
+
+        self.data[1]['weekly_infected_per_100000'] += 1e-3
+        self.assertTrue(mapper._is_changed(existing_row, self.data[1]))
+
+        self.data[1]['weekly_infected_per_100000'] = None
+        self.assertTrue(mapper._is_changed(existing_row, self.data[1]))
+
+    def test__get_fingerprint(self):
+        mapper = GlobalTransformedDataMapper()
+        fingerprint = mapper._get_fingerprint(self.data[1])
+
+        self.data[1]['weekly_infected_per_100000'] += 1e-12
+        self.data[1]['weekly_deaths'] = float(self.data[1]['weekly_deaths'])
+        self.assertEqual(fingerprint, mapper._get_fingerprint(self.data[1]))
+
+        self.data[1]['weekly_deaths'] += 1
+        self.assertNotEqual(fingerprint, mapper._get_fingerprint(self.data[1]))
+
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_map_saves_fingerprints(self):
+        GlobalTransformedDataMapper().map(self.data)
+
+        fingerprints = TransformedDataFingerprint.get_fingerprints(
+            GlobalTransformedData, GlobalTransformedData.objects.values_list('id', flat=True)
+        )
+        self.assertEqual(len(self.data), len(fingerprints))
+
+        with patch.object(GlobalTransformedDataMapper, '_is_changed') as is_changed:
+            insert, update = GlobalTransformedDataMapper()._split_data(self.data)
+
+        is_changed.assert_not_called()
+        self.assertListEqual([], insert)
+        self.assertListEqual([], update)
+
+    def test__get_existing_rows(self):
+        for item in self.data:
+            GlobalTransformedData.objects.create(**item)
+
+        existing_rows = GlobalTransformedDataMapper()._get_existing_rows(self.data[1:3])
+
+        self.assertCountEqual(
+            [(item['start_date'], item['end_date']) for item in self.data[1:3]], existing_rows.keys()
+        )
+        for item in self.data[1:3]:
+            existing_row = existing_rows[(item['start_date'], item['end_date'])]
+            for field in GlobalTransformedDataMapper._update_fields:
+                self.assertEqual(item[field], getattr(existing_row, field))
 
     def test__split_data(self):
         get_item_key = lambda item: tuple(
@@ -176,6 +226,61 @@ class GlobalTransformedDataMapperTestCase(TestCase):
 
         self.assertListEqual(self.data, db_data)
 
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_map_bumps_version_when_changed(self):
+        GlobalTransformedDataMapper().map(self.data)
+        self.assertEqual(1, TransformedDataVersion.get_version('GlobalTransformedData'))
+
+        GlobalTransformedDataMapper().map(self.data)
+        self.assertEqual(1, TransformedDataVersion.get_version('GlobalTransformedData'))
+
+        self.data[0]['weekly_infected'] = 255
+        GlobalTransformedDataMapper().map(self.data)
+        self.assertEqual(2, TransformedDataVersion.get_version('GlobalTransformedData'))
+        self.assertEqual(0, TransformedDataVersion.get_version('RegionTransformedData'))
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is supported only by postgresql')
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_map_copy_load(self):
+        GlobalTransformedData.objects.create(**self.data[0])
+        GlobalTransformedData.objects.create(**self.data[1])
+        unchanged_obj = GlobalTransformedData.objects.create(**self.data[2])
+        GlobalTransformedData.objects.filter(id=unchanged_obj.id).update(weekly_infected=0)
+
+        for field in filter(lambda x: x not in ('start_date', 'end_date',), self.data[0].keys()):
+            self.data[0][field] = 255
+        self.data[2]['weekly_infected'] = 0
+
+        with patch.object(GlobalTransformedDataMapper, '_log_update') as log_update:
+            GlobalTransformedDataMapper(copy_load=True).map(self.data)
+
+        db_data = list(GlobalTransformedData.objects.values().order_by('id'))
+        for item in db_data:
+            item.pop('id')
+
+        self.assertListEqual(self.data, db_data)
+        (insert_message, inserted), (update_message, updated) = [call.args for call in log_update.call_args_list]
+        self.assertEqual('Inserted GlobalTransformedData', insert_message)
+        self.assertListEqual([self.data[3]['start_date']], [obj.start_date for obj in inserted])
+        self.assertEqual('Updated GlobalTransformedData', update_message)
+        self.assertListEqual([self.data[0]['start_date']], [obj.start_date for obj in updated])
+
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is supported only by postgresql')
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_map_copy_load_skips_float_noise(self):
+        for item in self.data:
+            GlobalTransformedData.objects.create(**item)
+        noisy_data = [
+            {field: value * (1 + 1e-12) if isinstance(value, float) else value for field, value in item.items()}
+            for item in self.data
+        ]
+
+        with patch.object(GlobalTransformedDataMapper, '_log_update') as log_update:
+            GlobalTransformedDataMapper(copy_load=True).map(noisy_data)
+
+        log_update.assert_not_called()
+        self.assertEqual(0, TransformedDataVersion.get_version(GlobalTransformedData.__name__))
 
 class RegionTransformedDataMapperTestCase(TestCase):
     def setUp(self):
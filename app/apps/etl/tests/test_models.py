@@ -2,7 +2,8 @@ from datetime import date
 
 from django.test import TestCase
 
-from apps.etl.models import StopCoronaData, GogovData, GlobalTransformedData, RegionTransformedData
+from apps.etl.models import (StopCoronaData, GogovData, GlobalTransformedData, RegionTransformedData,
+                             TransformedDataVersion)
 
 
 class StopCoronaDataTestCase(TestCase):
@@ -558,3 +559,13 @@ class RegionTransformedDataTestCase(TestCase):
             'Томская обл.': {'region': 'Томская обл.', 'infected': 1326, 'deaths': 11, 'recovered': 1432}
         }
         self.assertDictEqual(estimated_data, data)
+
+
+class TransformedDataVersionTestCase(TestCase):
+    def test_bump(self):
+        with self.assertNumQueries(1):
+            TransformedDataVersion.bump(GlobalTransformedData)
+        TransformedDataVersion.bump(GlobalTransformedData)
+
+        self.assertListEqual([2, 0], TransformedDataVersion.get_versions(['GlobalTransformedData',
+                                                                          'RegionTransformedData']))
@@ -0,0 +1,24 @@
+from django.test import TestCase
+from pandas import Series
+
+from apps.etl.utils.region_names import RegionNamesNormalizer
+
+
+class RegionNamesNormalizerTestCase(TestCase):
+    def test_normalize_name(self):
+        self.assertEqual('Карелия', RegionNamesNormalizer.normalize_name('Республика Карелия'))
+        self.assertEqual('Ямало-Ненецкий АО', RegionNamesNormalizer.normalize_name('Ямало-Ненецкий автономный округ'))
+        self.assertEqual('Еврейская АО', RegionNamesNormalizer.normalize_name('Еврейская автономная область'))
+        self.assertEqual('Томская обл.', RegionNamesNormalizer.normalize_name('Томская область'))
+        self.assertEqual('Москва', RegionNamesNormalizer.normalize_name('Москва'))
+        self.assertIsNone(RegionNamesNormalizer.normalize_name(None))
+
+    def test_normalize(self):
+        regions = Series(['Республика Карелия', 'Москва', 'Московская область', 'Республика Карелия'],
+                         index=[3, 5, 7, 9], name='region')
+
+        normalized = RegionNamesNormalizer.normalize(regions)
+
+        self.assertListEqual([3, 5, 7, 9], list(normalized.index))
+        self.assertEqual('region', normalized.name)
+        self.assertListEqual(['Карелия', 'Москва', 'Московская обл.', 'Карелия'], list(normalized))
@@ -1,11 +1,16 @@
+import tempfile
+import threading
+import time
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, Mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from bs4 import BeautifulSoup
 
+from apps.etl.models import StopCoronaArticle
 from apps.etl.utils.parsers import stopcorona_parser
-from apps.etl.tests.mocks import LoggerMock
+from apps.etl.tests.mocks import LoggerMock, StopCoronaArticleMock
 
 
 class StopCoronaParserTestCase(TestCase):
@@ -44,6 +49,12 @@ class StopCoronaParserTestCase(TestCase):
         urls = stopcorona_parser.StopCoronaParser._get_url_list(all=False)
         self.assertListEqual(urls, expected_urls)
 
+        expected_urls = ['v-rossii-za-nedelyu-vyzdorovelo-article1', 'v-rossii-za-nedelyu-vyzdorovelo-article2', ]
+        urls = stopcorona_parser.StopCoronaParser._get_url_list(
+            all=False, known_urls={'v-rossii-za-nedelyu-vyzdorovelo-article3'}
+        )
+        self.assertListEqual(urls, expected_urls)
+
     @patch("apps.etl.utils.logging.Logger", LoggerMock)
     @patch("apps.etl.utils.parsers.stopcorona_parser.StopCoronaParser._get_url_list", Mock(return_value=None))
     def test_parse_page(self):
@@ -142,6 +153,36 @@ class StopCoronaParserTestCase(TestCase):
         urls = stopcorona_parser.StopCoronaParser._clean_table_data(tests_data)
         self.assertListEqual(urls, expected_urls)
 
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_parse_page_fast_path(self):
+        parser = stopcorona_parser.StopCoronaParser()
+
+        for page in StopCoronaArticleMock.get_pages():
+            with patch.object(stopcorona_parser.StopCoronaParser, '_parse_page_html5lib') as parse_page_html5lib:
+                data = parser._parse_page(page)
+
+            parse_page_html5lib.assert_not_called()
+            self.assertTrue(data)
+            self.assertEqual(parser._parse_page_html5lib(page), data)
+
+    @patch("apps.etl.utils.logging.Logger", LoggerMock)
+    def test_parse_page_html5lib_fallback(self):
+        # Table without tbody is fixed only by html5lib
+        page = """
+            <div class="article-detail__body">
+                <h3> По состоянию за 44 нед. 2023 г. (23.10 - 29.10.2023)</h3>
+                <table>
+                    <tr><td>Наименование субъекта</td><td>hospitalized</td><td>recovered</td><td>infected</td>
+                    <td>deaths</td></tr>
+                    <tr><td>Region 1</td><td>10</td><td>5</td><td>20</td><td>2</td></tr>
+                </table>
+            </div>
+        """
+
+        self.assertIsNone(stopcorona_parser.StopCoronaParser._extract_page_data(page))
+        data = stopcorona_parser.StopCoronaParser()._parse_page(page)
+        self.assertListEqual(['Region 1'], [item['region'] for item in data])
+
     def test_get_regions_data(self):
         tests_table_data = ['Region 1', 10, 5, 20, 2]
         tests_dates = [datetime.strptime('23.10.2023', '%d.%m.%Y').date(),
@@ -155,9 +196,11 @@ class StopCoronaParserTestCase(TestCase):
 
     @patch("apps.etl.utils.logging.Logger", LoggerMock)
     @patch("apps.etl.utils.parsers.stopcorona_parser.StopCoronaParser._get_url_list", Mock(return_value=None))
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_parse_url_list(self, mock_get):
         mock_response = mock_get.return_value
+        mock_response.status_code = 200
+        mock_response.headers = {}
         mock_response.text = """
                 <div class="article-detail__body">
                     <h3> По состоянию за 44 нед. 2023 г. (23.10 - 29.10.2023)</h3>
@@ -181,6 +224,7 @@ class StopCoronaParserTestCase(TestCase):
                         </table>
                 </div>
             """
+        mock_response.content = mock_response.text.encode()
 
         expected_data = [
             {
@@ -195,3 +239,175 @@ class StopCoronaParserTestCase(TestCase):
         ]
         urls = stopcorona_parser.StopCoronaParser()._parse_url_list([1])
         self.assertListEqual(urls, expected_data)
+
+
+class StubArticleHandler(BaseHTTPRequestHandler):
+    delay = 0.2
+    page = """
+        <div class="article-detail__body">
+            <h3> По состоянию за 44 нед. 2023 г. (23.10 - 29.10.2023)</h3>
+            <table>
+                <tbody>
+                    <tr><td>Наименование субъекта</td><td>hospitalized</td><td>recovered</td><td>infected</td>
+                    <td>deaths</td></tr>
+                    <tr><td>{region}</td><td>10</td><td>5</td><td>20</td><td>2</td></tr>
+                </tbody>
+            </table>
+        </div>
+    """
+
+    etag = None
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        handler = type(self)
+        with handler.lock:
+            handler.in_flight += 1
+            handler.max_in_flight = max(handler.max_in_flight, handler.in_flight)
+        time.sleep(self.delay)
+        with handler.lock:
+            handler.in_flight -= 1
+        if self.etag and self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = self.page.format(region=self.path.strip('/')).encode()
+
+        self.send_response(200)
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@patch("apps.etl.utils.logging.Logger", LoggerMock)
+@patch("apps.etl.utils.parsers.stopcorona_parser.StopCoronaParser._get_url_list", Mock(return_value=None))
+class StopCoronaParserFetchTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.cache_settings = override_settings(HTTP_CACHE_DIR=cls.cache_dir.name)
+        cls.cache_settings.enable()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubArticleHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url_base = f'http://127.0.0.1:{cls.server.server_port}/{{}}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.cache_settings.disable()
+        cls.cache_dir.cleanup()
+        super().tearDownClass()
+
+    def _parse(self, url_list, max_workers):
+        StopCoronaArticle.objects.all().delete()
+        parser = stopcorona_parser.StopCoronaParser()
+        with patch.multiple(stopcorona_parser.StopCoronaParser, _url_base=self.url_base, _max_workers=max_workers,
+                            _requests_per_second=None), patch.object(StubArticleHandler, 'max_in_flight', 0):
+            parsed_data = parser._parse_url_list(url_list)
+            max_in_flight = StubArticleHandler.max_in_flight
+
+        return parsed_data, max_in_flight
+
+    def test_parse_url_list_concurrently(self):
+        url_list = [f'Region-{i}' for i in range(6)]
+
+        sequential_data, sequential_in_flight = self._parse(url_list, max_workers=1)
+        concurrent_data, concurrent_in_flight = self._parse(url_list, max_workers=3)
+
+        self.assertListEqual(url_list, [item['region'] for item in concurrent_data])
+        self.assertListEqual(sequential_data, concurrent_data)
+        self.assertEqual(1, sequential_in_flight)
+        self.assertGreater(concurrent_in_flight, 1)
+        self.assertLessEqual(concurrent_in_flight, 3)
+
+    def test_parse_url_list_rate_limit(self):
+        url_list = [f'Region-{i}' for i in range(4)]
+
+        parser = stopcorona_parser.StopCoronaParser()
+        with patch.multiple(stopcorona_parser.StopCoronaParser, _url_base=self.url_base, _max_workers=4,
+                            _requests_per_second=5), patch.object(StubArticleHandler, 'delay', 0), \
+                patch('apps.etl.utils.http.time') as mock_time:
+            mock_time.monotonic.return_value = 0
+            parsed_data = parser._parse_url_list(url_list)
+
+        self.assertListEqual(url_list, [item['region'] for item in parsed_data])
+        self.assertListEqual([0.2, 0.4, 0.6], sorted(round(call.args[0], 6) for call in mock_time.sleep.call_args_list))
+
+    def test_iter_parsed_url_list_pipelined(self):
+        discovered_urls = []
+
+        def iter_url_list():
+            for i in range(6):
+                discovered_urls.append(f'Region-{i}')
+                yield f'Region-{i}'
+
+        parser = stopcorona_parser.StopCoronaParser()
+        with patch.multiple(stopcorona_parser.StopCoronaParser, _url_base=self.url_base, _max_workers=2,
+                            _requests_per_second=None):
+            parsed_articles = parser._iter_parsed_url_list(iter_url_list())
+            first_item = next(parsed_articles)[1][0]
+            discovered_count = len(discovered_urls)
+            parsed_data = [first_item, *(item for _, regions_data in parsed_articles for item in regions_data)]
+
+        self.assertEqual('Region-0', first_item['region'])
+        self.assertLess(discovered_count, len(discovered_urls))
+        self.assertListEqual(discovered_urls, [item['region'] for item in parsed_data])
+
+    def _crawl(self, url_list, **kwargs):
+        parsed_articles = list(stopcorona_parser.StopCoronaParser(**kwargs)._iter_parsed_url_list(url_list))
+        for crawl_state, _ in parsed_articles:
+            StopCoronaArticle.save_crawl_state(*crawl_state)
+
+        return parsed_articles
+
+    def test_parse_url_list_skips_not_modified(self):
+        url_list = [f'Region-{i}' for i in range(3)]
+
+        with patch.multiple(stopcorona_parser.StopCoronaParser, _url_base=self.url_base, _requests_per_second=None), \
+                patch.object(StubArticleHandler, 'etag', '"v1"'), patch.object(StubArticleHandler, 'delay', 0):
+            parsed_articles = self._crawl(url_list)
+            self.assertListEqual(url_list, [regions_data[0]['region'] for _, regions_data in parsed_articles])
+            self.assertSetEqual({'"v1"'}, set(StopCoronaArticle.objects.values_list('etag', flat=True)))
+
+            with patch.object(stopcorona_parser.StopCoronaParser, '_parse_page') as parse_page:
+                parsed_data = stopcorona_parser.StopCoronaParser()._parse_url_list(url_list)
+
+        parse_page.assert_not_called()
+        self.assertListEqual([], parsed_data)
+
+    def test_parse_url_list_skips_unchanged_content(self):
+        url_list = [f'Region-{i}' for i in range(3)]
+
+        with patch.multiple(stopcorona_parser.StopCoronaParser, _url_base=self.url_base, _requests_per_second=None), \
+                patch.object(StubArticleHandler, 'delay', 0):
+            self._crawl(url_list[:2])
+
+            with patch.object(stopcorona_parser.StopCoronaParser, '_parse_page', return_value=None) as parse_page:
+                parsed_articles = self._crawl(url_list)
+
+        self.assertListEqual([((StubArticleHandler.page.format(region='Region-2'),),)],
+                             [call for call in parse_page.call_args_list])
+        self.assertListEqual([(url, []) for url in url_list[:2]],
+                             [(crawl_state[0], regions_data) for crawl_state, regions_data in parsed_articles])
+        self.assertEqual(2, StopCoronaArticle.objects.count())
+
+    def test_parse_url_list_force(self):
+        url_list = [f'Region-{i}' for i in range(3)]
+
+        with patch.multiple(stopcorona_parser.StopCoronaParser, _url_base=self.url_base, _requests_per_second=None), \
+                patch.object(StubArticleHandler, 'etag', '"v1"'), patch.object(StubArticleHandler, 'delay', 0):
+            self._crawl(url_list)
+            parsed_data = stopcorona_parser.StopCoronaParser(force=True)._parse_url_list(url_list)
+
+        self.assertListEqual(url_list, [item['region'] for item in parsed_data])
@@ -748,6 +748,22 @@ class LegacyGlobalDataTransformerTestCase(TestCase):
 
         self.assertListEqual(estimated_result, result)
 
+    @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
+    @mock.patch('apps.etl.models.ExternalDatabaseStatistic.get_all_transform_data',
+                ExternalDatabaseStatisticMock.get_all_transform_data)
+    @mock.patch('apps.etl.models.ExternalDatabaseStatistic.get_weekly_transform_data',
+                ExternalDatabaseStatisticMock.get_weekly_transform_data)
+    @mock.patch('apps.etl.models.ExternalDatabaseStatistic.get_date_range',
+                ExternalDatabaseStatisticMock.get_date_range)
+    @mock.patch('apps.etl.models.ExternalDatabaseVaccination.get_all_transform_data',
+                ExternalDatabaseVaccinationMock.get_all_transform_data)
+    @mock.patch('apps.etl.models.ExternalDatabaseVaccination.get_weekly_transform_data',
+                ExternalDatabaseVaccinationMock.get_weekly_transform_data)
+    def test_run_pushdown(self):
+        result = LegacyGlobalDataTransformer.run(pushdown=True)
+
+        self.assertListEqual(LegacyGlobalDataTransformer.run(), result)
+
 
 class GlobalDataTransformerTestCase(TestCase):
     def setUp(self):
@@ -1016,6 +1032,34 @@ class GlobalDataTransformerTestCase(TestCase):
         ]
         self.assertListEqual(estimated_data, transformed_gogov_data)
 
+    def test__transform_gogov_data_week_without_data(self):
+        stopcorona_data = DataFrame([
+            {'start_date': date(2023, 12, 15), 'end_date': date(2023, 12, 21)},
+            {'start_date': date(2023, 12, 22), 'end_date': date(2023, 12, 28)},
+            {'start_date': date(2024, 1, 5), 'end_date': date(2024, 1, 11)},
+        ])
+        gogov_data = DataFrame([
+            {'date': date(2023, 12, 22), 'first_component': 350685, 'second_component': 362810},
+            {'date': date(2023, 12, 28), 'first_component': 350687, 'second_component': 362812},
+            {'date': date(2023, 12, 29), 'first_component': 350688, 'second_component': 362815},
+        ])
+
+        transformed_gogov_data = GlobalDataTransformer()._transform_gogov_data(gogov_data, stopcorona_data)
+        transformed_gogov_data = transformed_gogov_data.to_dict('records')
+
+        estimated_data = [
+            {
+                'start_date': date(2023, 12, 22),
+                'end_date': date(2023, 12, 28),
+                'weekly_vaccinations': 4,
+                'weekly_first_component': 2,
+                'weekly_second_component': 2,
+                'first_component': 350687,
+                'second_component': 362812,
+            },
+        ]
+        self.assertListEqual(estimated_data, transformed_gogov_data)
+
     def test__prepare_transformed_data(self):
         stopcorona_data = [
             {
@@ -1171,6 +1215,22 @@ class GlobalDataTransformerTestCase(TestCase):
         ]
         self.assertListEqual(estimated_data, transformed_data)
 
+    def test__add_cumulative_stats(self):
+        resulted_df = DataFrame([
+            {'weekly_infected': 200, 'weekly_recovered': 100, 'weekly_deaths': 12},
+            {'weekly_infected': 0, 'weekly_recovered': 50, 'weekly_deaths': 1},
+            {'weekly_infected': 30, 'weekly_recovered': 0, 'weekly_deaths': 0},
+        ])
+
+        GlobalDataTransformer()._add_cumulative_stats(resulted_df)
+
+        estimated_data = [
+            {'infected': 139119, 'recovered': 31654, 'deaths': 3184},
+            {'infected': 139119, 'recovered': 31704, 'deaths': 3185},
+            {'infected': 139149, 'recovered': 31704, 'deaths': 3185},
+        ]
+        self.assertListEqual(estimated_data, resulted_df[['infected', 'recovered', 'deaths']].to_dict('records'))
+
     @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
     def test_run(self):
         data = GlobalDataTransformer().run()
@@ -1389,6 +1449,16 @@ class LegacyRegionDataTransformerTestCase(TestCase):
         ]
         self.assertListEqual(estimated_result, result)
 
+    @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
+    @mock.patch('apps.etl.models.ExternalDatabaseStatistic.get_all_transform_data',
+                ExternalDatabaseStatisticMock.get_all_transform_data)
+    @mock.patch('apps.etl.models.ExternalDatabaseStatistic.get_weekly_transform_data',
+                ExternalDatabaseStatisticMock.get_weekly_transform_data)
+    def test_run_pushdown(self):
+        result = LegacyRegionDataTransformer.run(pushdown=True)
+
+        self.assertListEqual(LegacyRegionDataTransformer.run(), result)
+
 
 class RegionDataTransformerTestCase(TestCase):
     def setUp(self):
@@ -1569,6 +1639,25 @@ class RegionDataTransformerTestCase(TestCase):
             deaths=0,
         )
 
+    def test__add_cumulative_stats(self):
+        stopcorona_data = DataFrame([
+            {'region': 'Карелия', 'weekly_infected': 30, 'weekly_recovered': 32, 'weekly_deaths': 1},
+            {'region': 'Ульяновская обл.', 'weekly_infected': 5, 'weekly_recovered': 4, 'weekly_deaths': 0},
+            {'region': 'Карелия', 'weekly_infected': 21, 'weekly_recovered': 31, 'weekly_deaths': 0},
+        ])
+
+        RegionDataTransformer()._add_cumulative_stats(stopcorona_data)
+        stopcorona_data.replace({nan: None}, inplace=True)
+
+        estimated_data = [
+            {'region': 'Карелия', 'infected': 2566, 'recovered': 2618, 'deaths': 15},
+            {'region': 'Ульяновская обл.', 'infected': None, 'recovered': None, 'deaths': None},
+            {'region': 'Карелия', 'infected': 2587, 'recovered': 2649, 'deaths': 15},
+        ]
+        self.assertListEqual(
+            estimated_data, stopcorona_data[['region', 'infected', 'recovered', 'deaths']].to_dict('records')
+        )
+
     @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
     def test_run(self):
         data = RegionDataTransformer().run()
@@ -1762,7 +1851,7 @@ class TransformLegacyGlobalDataCommandTestCase(TestCase):
                 ExternalDatabaseVaccinationMock.get_all_transform_data)
     @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
     def test_handle_debug(self):
-        TransformLegacyGlobalData().handle(debug=True)
+        TransformLegacyGlobalData().handle(debug=True, pushdown=0)
 
         data = list(GlobalTransformedData.objects.values())
         for item in data:
@@ -1829,7 +1918,7 @@ class TransformLegacyGlobalDataCommandTestCase(TestCase):
                 ExternalDatabaseVaccinationMock.get_all_transform_data)
     @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
     def test_handle(self):
-        data = TransformLegacyGlobalData().handle(debug=False)
+        data = TransformLegacyGlobalData().handle(debug=False, pushdown=0)
 
         estimated_data = [
             {
@@ -2175,7 +2264,7 @@ class TransformLegacyRegionDataCommandTestCase(TestCase):
                 ExternalDatabaseStatisticMock.get_all_transform_data)
     @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
     def test_handle(self):
-        data = TransformLegacyRegionData().handle(debug=False)
+        data = TransformLegacyRegionData().handle(debug=False, pushdown=0)
         estimated_data = [
             {
                 "region": "Карелия",
@@ -2298,7 +2387,7 @@ class TransformLegacyRegionDataCommandTestCase(TestCase):
                 ExternalDatabaseStatisticMock.get_all_transform_data)
     @mock.patch("apps.etl.utils.logging.Logger", LoggerMock)
     def test_handle_debug(self):
-        TransformLegacyRegionData().handle(debug=True)
+        TransformLegacyRegionData().handle(debug=True, pushdown=0)
 
         data = list(RegionTransformedData.objects.values())
         for item in data:
@@ -2,12 +2,14 @@
 import logging
 from datetime import timedelta
 
+import numpy as np
 import pandas as pd
 from numpy import nan
 
 from apps.etl.models import ExternalDatabaseStatistic, ExternalDatabaseVaccination, CsvData, StopCoronaData, \
     GogovData, GlobalTransformedData
 from .transforming_functions import GenericTransformingFunctions
+from apps.etl.utils.dataframes import read_dataframe
 from apps.etl.utils.logging import get_task_logger
 
 pd.options.mode.chained_assignment = None
@@ -16,10 +18,13 @@ pd.options.mode.chained_assignment = None
 class LegacyGlobalDataTransformer:
 
     @classmethod
-    def run(cls):
-        external_data_main, vaccinations_data, csv_data = cls._get_dataframes()
-        external_data_main = cls._summarize_external_data_main(external_data_main)
-        merged_df = cls._merge_all_dfs(external_data_main, vaccinations_data, csv_data)
+    def run(cls, pushdown=False):
+        if pushdown:
+            merged_df = cls._get_weekly_merged_df()
+        else:
+            external_data_main, vaccinations_data, csv_data = cls._get_dataframes()
+            external_data_main = cls._summarize_external_data_main(external_data_main)
+            merged_df = cls._merge_all_dfs(external_data_main, vaccinations_data, csv_data)
         transformed_df = cls._apply_transforms(merged_df)
         result = transformed_df.to_dict('records')
 
@@ -32,9 +37,9 @@ class LegacyGlobalDataTransformer:
         vaccinations_data = ExternalDatabaseVaccination.get_all_transform_data()
         csv_data = CsvData.get_all_transform_data()
 
-        external_data_main = pd.DataFrame(data=external_data_main)
-        vaccinations_data = pd.DataFrame(data=vaccinations_data)
-        csv_data = pd.DataFrame(data=csv_data)
+        external_data_main = read_dataframe(external_data_main)
+        vaccinations_data = read_dataframe(vaccinations_data)
+        csv_data = read_dataframe(csv_data)
 
         return external_data_main, vaccinations_data, csv_data
 
@@ -64,6 +69,50 @@ class LegacyGlobalDataTransformer:
 
         return merged_df
 
+    @classmethod
+    def _get_weekly_merged_df(cls):
+        """
+        Same data as in _merge_all_dfs, but external data is summed by weeks in database.
+        Rows are labeled by week end, so resampling to weeks sums csv days with external part of the same week.
+        """
+        csv_data = read_dataframe(CsvData.get_all_transform_data())
+        csv_data['date'] = pd.to_datetime(csv_data['date'])
+        csv_data.rename(columns={'cases': 'infection_per_day', 'deaths': 'death_per_day'}, inplace=True)
+
+        csv_dates = csv_data['date'].dropna()
+        csv_start_date, csv_end_date = (csv_dates.min().date(), csv_dates.max().date()) if not csv_dates.empty \
+            else (None, None)
+
+        external_data_main = read_dataframe(
+            ExternalDatabaseStatistic.get_weekly_transform_data(after_date=csv_end_date)
+        )
+        external_data_main.rename(
+            columns={'week_end': 'date',
+                     'weekly_deaths': 'death_per_day',
+                     'weekly_infected': 'infection_per_day',
+                     'weekly_recovered': 'recovery_per_day'}, inplace=True)
+
+        # Vaccinations are taken only for days of main data, like with left merge by date
+        external_dates = ExternalDatabaseStatistic.get_date_range(after_date=csv_end_date)
+        start_date = csv_start_date or external_dates['start_date']
+        end_date = external_dates['end_date'] or csv_end_date
+        if start_date:
+            vaccinations_data = read_dataframe(
+                ExternalDatabaseVaccination.get_weekly_transform_data(start_date, end_date)
+            )
+        else:
+            vaccinations_data = pd.DataFrame(columns=['week_end', 'weekly_people_vaccinated', 'weekly_vaccinations'])
+        vaccinations_data.rename(
+            columns={'week_end': 'date',
+                     'weekly_people_vaccinated': 'daily_people_vaccinated',
+                     'weekly_vaccinations': 'daily_vaccinations'}, inplace=True)
+
+        merged_df = pd.concat([csv_data, external_data_main, vaccinations_data], ignore_index=True)
+        merged_df['date'] = pd.to_datetime(merged_df['date'])
+        merged_df.sort_values(by='date', ascending=True, inplace=True)
+
+        return merged_df
+
     @classmethod
     def _apply_transforms(cls, merged_df):
         weekly_df = cls._transform_to_weekly_format(merged_df)
@@ -98,13 +147,10 @@ class LegacyGlobalDataTransformer:
 
     @classmethod
     def _log_result(cls, result):
-        logger = get_task_logger()
-
-        for item in result:
-            log_data = {**item,
-                        'start_date': item['start_date'].strftime('%d-%m-%Y'),
-                        'end_date': item['end_date'].strftime('%d-%m-%Y')}
-            logger.log(logging.INFO, 'Transformed legacy global data', **log_data)
+        rows = ({**item,
+                 'start_date': item['start_date'].strftime('%d-%m-%Y'),
+                 'end_date': item['end_date'].strftime('%d-%m-%Y')} for item in result)
+        get_task_logger().log_rows(logging.INFO, 'Transformed legacy global data', rows)
 
 
 class GlobalDataTransformer:
@@ -144,48 +190,32 @@ class GlobalDataTransformer:
         return stopcorona_data, gogov_data
 
     def _transform_gogov_data(self, gogov_data, stopcorona_data):
-        gogov_data['daily_first_component'] = None
-        gogov_data['daily_second_component'] = None
-        gogov_data['daily_vaccinations'] = None
+        self._add_daily_stats(gogov_data)
+
+        # Every week is a closed [start_date, end_date] interval over the sorted gogov dates, so its bounds are
+        # found by binary search and weekly sums are taken as differences of running totals
+        gogov_dates = pd.to_datetime(gogov_data['date']).to_numpy()
+        week_starts = gogov_dates.searchsorted(pd.to_datetime(stopcorona_data['start_date']).to_numpy(), side='left')
+        week_ends = gogov_dates.searchsorted(pd.to_datetime(stopcorona_data['end_date']).to_numpy(), side='right')
+
+        daily_data = gogov_data[['daily_first_component', 'daily_second_component', 'daily_vaccinations']].to_numpy()
+        running_totals = np.zeros((len(daily_data) + 1, daily_data.shape[1]), dtype='int64')
+        np.cumsum(daily_data, axis=0, out=running_totals[1:])
+        weekly_data = running_totals[week_ends] - running_totals[week_starts]
+
+        latest_on_week = gogov_data[['first_component', 'second_component']].to_numpy()[week_ends - 1]
+
+        transformed_gogov_data = pd.DataFrame({
+            'weekly_vaccinations': weekly_data[:, 2],
+            'weekly_first_component': weekly_data[:, 0],
+            'weekly_second_component': weekly_data[:, 1],
+            'first_component': latest_on_week[:, 0],
+            'second_component': latest_on_week[:, 1],
+            'start_date': stopcorona_data['start_date'].to_numpy(),
+            'end_date': stopcorona_data['end_date'].to_numpy(),
+        })
+        transformed_gogov_data = transformed_gogov_data[week_ends > week_starts].reset_index(drop=True)
 
-        if self.latest:
-            gogov_data['daily_first_component'][0] = gogov_data['first_component'][0] - self.latest_values[
-                'first_component']
-            gogov_data['daily_second_component'][0] = gogov_data['second_component'][0] - self.latest_values[
-                'second_component']
-            gogov_data['daily_vaccinations'][0] = gogov_data['daily_first_component'][0] + \
-                                                  gogov_data['daily_second_component'][0]
-
-        for i in range(1, len(gogov_data)):
-            gogov_data['daily_first_component'][i] = gogov_data['first_component'][i] - \
-                                                     gogov_data['first_component'][i - 1]
-            gogov_data['daily_second_component'][i] = gogov_data['second_component'][i] - \
-                                                      gogov_data['second_component'][i - 1]
-            gogov_data['daily_vaccinations'][i] = gogov_data['daily_first_component'][i] + \
-                                                  gogov_data['daily_second_component'][i]
-
-        transformed_gogov_data = []
-        for _, row in stopcorona_data[['start_date', 'end_date', ]].iterrows():
-            gogov_weekly_data = gogov_data[(gogov_data.date >= row.start_date) & (gogov_data.date <= row.end_date)]
-
-            if not gogov_weekly_data.empty:
-                weekly_data = gogov_weekly_data[
-                    ['daily_first_component', 'daily_second_component', 'daily_vaccinations']].sum()
-                latest_on_week = gogov_weekly_data[['first_component', 'second_component', 'date']].iloc[-1]
-
-                new_row = {
-                    'weekly_vaccinations': weekly_data['daily_vaccinations'],
-                    'weekly_first_component': weekly_data['daily_first_component'],
-                    'weekly_second_component': weekly_data['daily_second_component'],
-                    'first_component': latest_on_week['first_component'],
-                    'second_component': latest_on_week['second_component'],
-                    'start_date': row.start_date,
-                    'end_date': row.end_date,
-                }
-
-                transformed_gogov_data.append(new_row)
-
-        transformed_gogov_data = pd.DataFrame(data=transformed_gogov_data)
         return transformed_gogov_data
 
     def _prepare_transformed_data(self, stopcorona_data, gogov_data):
@@ -208,25 +238,29 @@ class GlobalDataTransformer:
         return resulted_df
 
     def _add_cumulative_stats(self, resulted_df):
-        resulted_df['infected'] = None
-        resulted_df['recovered'] = None
-        resulted_df['deaths'] = None
+        for field in ('infected', 'recovered', 'deaths'):
+            # Cumulative stats are kept integer, missing weekly values would turn them into floats otherwise
+            cumulative = resulted_df[f'weekly_{field}'].cumsum() + self.latest_values[field]
+            resulted_df[field] = cumulative.astype('Int64')
 
-        resulted_df['infected'][0] = self.latest_values['infected'] + resulted_df['weekly_infected'][0]
-        resulted_df['recovered'][0] = self.latest_values['recovered'] + resulted_df['weekly_recovered'][0]
-        resulted_df['deaths'][0] = self.latest_values['deaths'] + resulted_df['weekly_deaths'][0]
+    def _add_daily_stats(self, gogov_data):
+        # Daily values are differences between consecutive cumulative gogov values. The first day has no previous
+        # value, so in latest mode it is computed from the latest loaded values, otherwise it doesn't count
+        components = gogov_data[['first_component', 'second_component']]
+        daily_data = components.diff()
 
-        for i in range(1, len(resulted_df)):
-            resulted_df['infected'][i] = resulted_df['infected'][i - 1] + resulted_df['weekly_infected'][i]
-            resulted_df['recovered'][i] = resulted_df['recovered'][i - 1] + resulted_df['weekly_recovered'][i]
-            resulted_df['deaths'][i] = resulted_df['deaths'][i - 1] + resulted_df['weekly_deaths'][i]
+        if self.latest:
+            daily_data.iloc[0] = components.iloc[0] - pd.Series(self.latest_values)[components.columns]
+
+        daily_data = daily_data.fillna(0).astype('int64')
+
+        gogov_data['daily_first_component'] = daily_data['first_component']
+        gogov_data['daily_second_component'] = daily_data['second_component']
+        gogov_data['daily_vaccinations'] = daily_data['first_component'] + daily_data['second_component']
 
     @classmethod
     def _log_result(cls, result):
-        logger = get_task_logger()
-
-        for item in result:
-            log_data = {**item,
-                        'start_date': item['start_date'].strftime('%d-%m-%Y'),
-                        'end_date': item['end_date'].strftime('%d-%m-%Y')}
-            logger.log(logging.INFO, 'Transformed global data', **log_data)
+        rows = ({**item,
+                 'start_date': item['start_date'].strftime('%d-%m-%Y'),
+                 'end_date': item['end_date'].strftime('%d-%m-%Y')} for item in result)
+        get_task_logger().log_rows(logging.INFO, 'Transformed global data', rows)
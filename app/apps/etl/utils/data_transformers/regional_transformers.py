@@ -7,6 +7,8 @@ from numpy import nan
 
 from apps.etl.models import ExternalDatabaseStatistic, StopCoronaData, RegionTransformedData
 from .transforming_functions import GenericTransformingFunctions
+from apps.etl.utils.region_names import RegionNamesNormalizer
+from apps.etl.utils.dataframes import read_dataframe
 from apps.etl.utils.logging import get_task_logger
 
 pd.options.mode.chained_assignment = None
@@ -14,8 +16,8 @@ pd.options.mode.chained_assignment = None
 
 class LegacyRegionDataTransformer:
     @classmethod
-    def run(cls):
-        data_df = cls._get_dataframe()
+    def run(cls, pushdown=False):
+        data_df = cls._get_weekly_dataframe() if pushdown else cls._get_dataframe()
         transformed_df = cls._apply_transforms(data_df)
         result = transformed_df.to_dict('records')
 
@@ -25,7 +27,19 @@ class LegacyRegionDataTransformer:
     @classmethod
     def _get_dataframe(cls):
         data = ExternalDatabaseStatistic.get_all_transform_data(with_region=True)
-        data_df = pd.DataFrame(data=data)
+        data_df = read_dataframe(data)
+        return data_df
+
+    @classmethod
+    def _get_weekly_dataframe(cls):
+        # Weeks are summed by database, rows are labeled by week end, so resampling keeps them as is
+        data = ExternalDatabaseStatistic.get_weekly_transform_data(with_region=True)
+        data_df = read_dataframe(data)
+        data_df.rename(
+            columns={'week_end': 'date',
+                     'weekly_deaths': 'death_per_day',
+                     'weekly_infected': 'infection_per_day',
+                     'weekly_recovered': 'recovery_per_day'}, inplace=True)
         return data_df
 
     @classmethod
@@ -55,32 +69,13 @@ class LegacyRegionDataTransformer:
 
     @classmethod
     def _log_result(cls, result):
-        logger = get_task_logger()
-
-        for item in result:
-            log_data = {**item,
-                        'start_date': item['start_date'].strftime('%d-%m-%Y'),
-                        'end_date': item['end_date'].strftime('%d-%m-%Y')}
-            logger.log(logging.INFO, 'Transformed legacy region data', **log_data)
+        rows = ({**item,
+                 'start_date': item['start_date'].strftime('%d-%m-%Y'),
+                 'end_date': item['end_date'].strftime('%d-%m-%Y')} for item in result)
+        get_task_logger().log_rows(logging.INFO, 'Transformed legacy region data', rows)
 
 
 class RegionDataTransformer:
-    _regions_map = (
-        ('Республика Карелия', 'Карелия'), ('Еврейская автономная область', 'Еврейская АО'),
-        ('Республика Коми', 'Коми'), ('Республика Адыгея', 'Адыгея'),
-        ('Кабардино-Балкарская Республика', 'Кабардино-Балкария'), ('Республика Хакасия', 'Хакасия'),
-        ('Ямало-Ненецкий автономный округ', 'Ямало-Ненецкий АО'), ('Республика Крым', 'Крым'),
-        ('Чувашская Республика', 'Чувашия'), ('Ханты-Мансийский АО', 'ХМАО – Югра'),
-        ('Ханты-Мансийский автономный округ', 'ХМАО – Югра'), ('Ненецкий автономный округ', 'Ненецкий АО'),
-        ('Чеченская Республика', 'Чечня'), ('Республика Тыва', 'Тыва'), ('Республика Калмыкия', 'Калмыкия'),
-        ('Республика Саха (Якутия)', 'Саха (Якутия)'), ('Республика Мордовия', 'Мордовия'),
-        ('Удмуртская Республика', 'Удмуртия'), ('Республика Башкортостан', 'Башкортостан'),
-        ('Республика Татарстан', 'Татарстан'), ('Республика Северная Осетия — Алания', 'Северная Осетия'),
-        ('Карачаево-Черкесская Республика', 'Карачаево-Черкессия'), ('Республика Ингушетия', 'Ингушетия'),
-        ('Чукотский автономный округ', 'Чукотский АО'), ('Республика Бурятия', 'Бурятия'),
-        ('Республика Дагестан', 'Дагестан'), ('Республика Марий Эл', 'Марий Эл'), ('Республика Алтай', 'Алтай'),
-    )
-
     def __init__(self, latest=False):
         self.latest = latest
 
@@ -115,39 +110,21 @@ class RegionDataTransformer:
 
     @classmethod
     def _rename_regions(cls, stopcorona_data):
-        for mapping in cls._regions_map:
-            stopcorona_data['region'] = stopcorona_data['region'].str.replace(*mapping)
-        stopcorona_data['region'] = stopcorona_data['region'].str.replace('область', 'обл.')
+        stopcorona_data['region'] = RegionNamesNormalizer.normalize(stopcorona_data['region'])
 
     def _add_cumulative_stats(self, stopcorona_data):
         latest_data_map = RegionTransformedData.get_highest_not_null_values(self.latest)
+        regions_data = stopcorona_data.groupby('region', sort=False)
 
-        stopcorona_data['infected'] = None
-        stopcorona_data['recovered'] = None
-        stopcorona_data['deaths'] = None
-
-        for key, item in latest_data_map.items():
-            region_data = stopcorona_data[stopcorona_data.region == key]
-
-            region_data['infected'].iloc[0] = item['infected'] + region_data['weekly_infected'].iloc[0]
-            region_data['recovered'].iloc[0] = item['recovered'] + region_data['weekly_recovered'].iloc[0]
-            region_data['deaths'].iloc[0] = item['deaths'] + region_data['weekly_deaths'].iloc[0]
-
-            for i in range(1, len(region_data)):
-                region_data['infected'].iloc[i] = region_data['infected'].iloc[i - 1] + \
-                                                  region_data['weekly_infected'].iloc[i]
-                region_data['recovered'].iloc[i] = region_data['recovered'].iloc[i - 1] + \
-                                                   region_data['weekly_recovered'].iloc[i]
-                region_data['deaths'].iloc[i] = region_data['deaths'].iloc[i - 1] + region_data['weekly_deaths'].iloc[i]
-
-            stopcorona_data[stopcorona_data.region == key] = region_data
+        # Regions without previously loaded data have no seed, so their cumulative stats stay empty.
+        # Empty seeds are NaN, so sums are cast to nullable integers to keep integer values
+        for field in ('infected', 'recovered', 'deaths'):
+            seeds = stopcorona_data['region'].map({key: item[field] for key, item in latest_data_map.items()})
+            stopcorona_data[field] = (regions_data[f'weekly_{field}'].cumsum() + seeds).astype('Int64')
 
     @classmethod
     def _log_result(cls, result):
-        logger = get_task_logger()
-
-        for item in result:
-            log_data = {**item,
-                        'start_date': item['start_date'].strftime('%d-%m-%Y'),
-                        'end_date': item['end_date'].strftime('%d-%m-%Y')}
-            logger.log(logging.INFO, 'Transformed region data', **log_data)
+        rows = ({**item,
+                 'start_date': item['start_date'].strftime('%d-%m-%Y'),
+                 'end_date': item['end_date'].strftime('%d-%m-%Y')} for item in result)
+        get_task_logger().log_rows(logging.INFO, 'Transformed region data', rows)
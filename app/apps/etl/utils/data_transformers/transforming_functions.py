@@ -1,12 +1,15 @@
-import pandas as pd
+import numpy as np
 from numpy import nan
 
 RF_POPULATION = 146447424
 
 
-class GenericTransformingFunctions:
-    _default_ratio_keys = ('weekly_recovered_infected_ratio', 'weekly_deaths_infected_ratio',)
+def _as_float(column):
+    """Float array of column, missing values of nullable integer columns become NaN"""
+    return column.to_numpy(dtype='float64', na_value=nan)
+
 
+class GenericTransformingFunctions:
     @staticmethod
     def add_cumulative_stats(df, region=False):
         base_query = df.groupby('region') if region else df
@@ -22,45 +25,30 @@ class GenericTransformingFunctions:
 
     @staticmethod
     def add_per_100000_stats(df):
-        def calculate_columns(row):
-            columns = {
-                'weekly_infected_per_100000': row.weekly_infected / RF_POPULATION * 100000,
-                'weekly_deaths_per_100000': row.weekly_deaths / RF_POPULATION * 100000,
-                'weekly_recovered_per_100000': row.weekly_recovered / RF_POPULATION * 100000,
-                'infected_per_100000': row.infected / RF_POPULATION * 100000,
-                'deaths_per_100000': row.deaths / RF_POPULATION * 100000,
-                'recovered_per_100000': row.recovered / RF_POPULATION * 100000,
-            }
-            return columns
-
-        applied_df = df.apply(lambda row: calculate_columns(row), axis=1, result_type='expand')
-        df = pd.concat([df, applied_df], axis=1)
+        for field in ('weekly_infected', 'weekly_deaths', 'weekly_recovered', 'infected', 'deaths', 'recovered'):
+            df[f'{field}_per_100000'] = _as_float(df[field]) / RF_POPULATION * 100000
 
         return df
 
     @classmethod
     def add_ratio_stats(cls, df, region=False):
-        def calculate_columns(row):
-            columns = dict.fromkeys(cls._default_ratio_keys, None)
-
-            if row.weekly_infected:
-                columns = {
-                    'weekly_recovered_infected_ratio': row.weekly_recovered / row.weekly_infected,
-                    'weekly_deaths_infected_ratio': row.weekly_deaths / row.weekly_infected,
-                }
+        # Ratios to weekly infected are empty for weeks without infected
+        weekly_infected = _as_float(df['weekly_infected'])
+        has_infected = weekly_infected != 0
+
+        ratio_fields = {
+            'weekly_recovered_infected_ratio': 'weekly_recovered',
+            'weekly_deaths_infected_ratio': 'weekly_deaths',
+        }
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for ratio_field, field in ratio_fields.items():
+                df[ratio_field] = np.where(has_infected, _as_float(df[field]) / weekly_infected, nan)
 
             if not region:
-                columns['vaccinations_population_ratio'] = row.second_component / RF_POPULATION
-
-                if row.weekly_infected:
-                    columns['weekly_vaccinations_infected_ratio'] = row.weekly_vaccinations / row.weekly_infected
-                else:
-                    columns['weekly_vaccinations_infected_ratio'] = None
-
-            return columns
-
-        applied_df = df.apply(lambda row: calculate_columns(row), axis=1, result_type='expand')
-        df = pd.concat([df, applied_df], axis=1)
+                df['vaccinations_population_ratio'] = _as_float(df['second_component']) / RF_POPULATION
+                df['weekly_vaccinations_infected_ratio'] = np.where(
+                    has_infected, _as_float(df['weekly_vaccinations']) / weekly_infected, nan
+                )
 
         return df
 
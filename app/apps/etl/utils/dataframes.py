@@ -0,0 +1,53 @@
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.db.models import QuerySet
+
+EXTRACTION_CHUNK_SIZE = 5000
+
+_FIELD_DTYPES = {
+    'DateField': 'datetime64[ns]',
+    'IntegerField': 'int64',
+    'BigIntegerField': 'int64',
+    'FloatField': 'float64',
+}
+
+
+def read_dataframe(data, chunk_size=EXTRACTION_CHUNK_SIZE):
+    """
+    Builds DataFrame from values queryset without materializing it as list of dicts.
+    Rows are read through server side cursor by chunks, every chunk is converted to typed column arrays at once.
+    Other data is passed to DataFrame constructor as is.
+    """
+    if not isinstance(data, QuerySet):
+        return pd.DataFrame(data=data)
+
+    fields = [*data.query.values_select, *data.query.annotation_select]
+    dtypes = [_get_field_dtype(data, field) for field in fields]
+    columns_chunks = [[] for _ in fields]
+
+    rows = data.values_list(*fields).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        for column_chunks, column_values, dtype in zip(columns_chunks, zip(*chunk), dtypes):
+            column_chunks.append(_to_array(column_values, dtype))
+
+    columns = {
+        field: np.concatenate(column_chunks) if column_chunks else np.array([], dtype=dtype)
+        for field, column_chunks, dtype in zip(fields, columns_chunks, dtypes)
+    }
+    return pd.DataFrame(data=columns)
+
+
+def _get_field_dtype(queryset, field):
+    annotation = queryset.query.annotation_select.get(field)
+    model_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(field)
+    return _FIELD_DTYPES.get(model_field.get_internal_type(), 'object')
+
+
+def _to_array(values, dtype):
+    try:
+        return np.array(values, dtype=dtype)
+    except TypeError:
+        # Column contains nulls, so they are stored as nan like pandas does
+        return np.array(values, dtype='float64')
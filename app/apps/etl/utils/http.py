@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from prometheus_client import Counter
+
+from apps.etl.utils.metrics import ETL_METRICS_REGISTRY
+
+HTTP_CACHE_REQUESTS = Counter(
+    'etl_http_cache_requests', 'Requests of external scrapers by result of http cache', ['host', 'result'],
+    registry=ETL_METRICS_REGISTRY,
+)
+
+
+def get_http_cache():
+    return HttpCache(settings.HTTP_CACHE_DIR, settings.HTTP_CACHE_MAX_SIZE)
+
+
+class RateLimiter:
+    """Spaces out requests to the same host, can be shared between threads"""
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._lock = threading.Lock()
+        self._next_request_times = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_times.get(host, now))
+            self._next_request_times[host] = request_time + self.interval
+
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+class CachedResponse:
+    def __init__(self, status_code, text, headers, not_modified=False):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+        self.not_modified = not_modified
+
+
+class HttpCache:
+    """
+    On-disk cache of external pages, which are validated by conditional requests with ETag/Last-Modified.
+    Not modified pages are returned from cache, least recently used entries are evicted when cache outgrows max size.
+    """
+    _validators = {'ETag': 'If-None-Match', 'Last-Modified': 'If-Modified-Since'}
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def get(self, url, fetch, headers=None, **kwargs):
+        """Requests url by fetch function, e.g. requests.get or session.get, with validators of cached entry"""
+        entry = self._read_entry(url)
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update({
+                header: entry['headers'][field]
+                for field, header in self._validators.items() if field in entry['headers']
+            })
+
+        response = fetch(url, headers=request_headers, **kwargs)
+        host = urlparse(url).netloc
+
+        if response.status_code == 304:
+            HTTP_CACHE_REQUESTS.labels(host=host, result='hit').inc()
+            if entry:
+                self._touch_entry(url)
+                return CachedResponse(304, entry['text'], entry['headers'], not_modified=True)
+
+            return CachedResponse(304, None, response.headers, not_modified=True)
+
+        HTTP_CACHE_REQUESTS.labels(host=host, result='miss').inc()
+        validators = {field: response.headers[field] for field in self._validators if field in response.headers}
+        if response.status_code == 200 and validators:
+            self._write_entry(url, {'text': response.text, 'headers': validators})
+
+        return CachedResponse(response.status_code, response.text, response.headers)
+
+    def _get_entry_path(self, url):
+        return self.cache_dir.joinpath(hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def _read_entry(self, url):
+        try:
+            with open(self._get_entry_path(url), encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _touch_entry(self, url):
+        try:
+            os.utime(self._get_entry_path(url))
+        except FileNotFoundError:
+            pass
+
+    def _write_entry(self, url, entry):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._get_entry_path(url)
+        temp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(temp_path, path)
+
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob('*.json'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(entry_size for _, entry_size, _ in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_size:
+                    break
+
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
@@ -1,16 +1,24 @@
 import logging
 import json
+import queue
+import threading
+import time
+from itertools import islice
 
 from django.conf import settings
+from logging_loki import LokiHandler
 
 
 def get_task_logger():
-    return Logger(logging.getLogger('django')) if settings.DEBUG else Logger(logging.getLogger('task'))
+    logger = logging.getLogger('django') if settings.DEBUG else logging.getLogger('task')
+    return Logger(logger, summary=settings.ETL_LOG_SUMMARY, sample_size=settings.ETL_LOG_SAMPLE_SIZE)
 
 
 class Logger:
-    def __init__(self, logger: logging.Logger):
+    def __init__(self, logger: logging.Logger, summary=False, sample_size=5):
         self.logger = logger
+        self.summary = summary
+        self.sample_size = sample_size
 
     def log(self, level, msg, **extra):
         dict_message = {
@@ -18,3 +26,91 @@ class Logger:
             **extra,
         }
         self.logger.log(level, dict_message)
+
+    def log_rows(self, level, msg, rows, **extra):
+        """Logs record per row, in summary mode logs single record with count of rows and a few of them as samples"""
+        if not self.summary:
+            for row in rows:
+                self.log(level, msg, **row, **extra)
+            return
+
+        rows = iter(rows)
+        samples = list(islice(rows, self.sample_size))
+        count = len(samples) + sum(1 for _ in rows)
+        if count:
+            self.log(level, msg, count=count, samples=samples, **extra)
+
+
+class BatchingLokiHandler(LokiHandler):
+    """
+    Loki handler which doesn't push records in the logging thread.
+    Records are queued and pushed from background thread by batches of batch_size or every flush_interval seconds.
+    """
+
+    def __init__(self, url, tags=None, auth=None, batch_size=500, flush_interval=2.0):
+        super().__init__(url, tags=tags, auth=auth, version='1')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='loki-batching-handler', daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        try:
+            self._queue.put((record, self.format(record)))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Waits until queued records are pushed"""
+        if self._thread.is_alive():
+            flushed = threading.Event()
+            self._queue.put(flushed)
+            flushed.wait(self.flush_interval * 5)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(self.flush_interval * 5)
+        self.emitter.close()
+        super().close()
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch = []
+            flushed = None
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+                if item is None:
+                    closed = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed = item
+                    break
+                batch.append(item)
+
+            if batch:
+                self._push(batch)
+            if flushed:
+                flushed.set()
+
+    def _push(self, batch):
+        streams = {}
+        for record, line in batch:
+            labels = self.emitter.build_tags(record)
+            key = json.dumps(labels, sort_keys=True, default=str)
+            stream = streams.setdefault(key, {'stream': labels, 'values': []})
+            stream['values'].append([str(int(record.created * 1e9)), line])
+
+        try:
+            response = self.emitter.session.post(self.emitter.url, json={'streams': list(streams.values())})
+            if response.status_code != self.emitter.success_response_code:
+                raise ValueError(f'Unexpected Loki API response status code: {response.status_code}')
+        except Exception:
+            self.handleError(batch[0][0])
@@ -1,10 +1,15 @@
+import hashlib
 import logging
+import math
 from datetime import datetime
 from abc import ABC
 
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.models import Model
 
-from apps.etl.models import GlobalTransformedData, RegionTransformedData
+from apps.etl.models import (GlobalTransformedData, RegionTransformedData, TransformedDataFingerprint,
+                             TransformedDataVersion)
 from apps.etl.utils.logging import get_task_logger
 
 
@@ -13,12 +18,20 @@ class TransformedDataMapperBase(ABC):
     _object_key_fields = ()
     _batch_size = 500
     _update_fields = ()
+    # Floats are compared with relative tolerance, so recalculation noise doesn't cause updates
+    _float_rel_tol = 1e-9
+    _fingerprint_digits = 12
 
-    def __init__(self):
-        self.existing_objects = {self._get_item_key(obj): obj for obj in self._model.objects.all()}
+    def __init__(self, copy_load=None):
+        self.copy_load = settings.TRANSFORMED_DATA_COPY_LOAD if copy_load is None else copy_load
         self.logger = get_task_logger()
 
     def map(self, data):
+        changed = self._copy_map(data) if self.copy_load else self._bulk_map(data)
+        if changed:
+            TransformedDataVersion.bump(self._model)
+
+    def _bulk_map(self, data):
         insert, update = self._split_data(data)
 
         if insert:
@@ -29,47 +42,171 @@ class TransformedDataMapperBase(ABC):
             self._model.objects.bulk_update(update, fields=self._update_fields, batch_size=self._batch_size)
             self._log_update(f'Updated {self._model.__name__}', update)
 
+        inserted_ids = {self._get_item_key(obj): obj.pk for obj in insert}
+        self._save_fingerprints(
+            (object_id or inserted_ids[key], fingerprint) for key, (object_id, fingerprint) in self.fingerprints.items()
+        )
+
+        return bool(insert or update)
+
+    def _copy_map(self, data):
+        """
+        Streams data through COPY into staging table and merges it by single INSERT ... ON CONFLICT DO UPDATE.
+        Existing rows are rewritten only if some of the fields are changed.
+        """
+        if not data:
+            return False
+
+        fields = [field for field in (*self._object_key_fields, *self._update_fields) if field in data[0]]
+        model_fields = [self._model._meta.get_field(field) for field in fields]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._model._meta.db_table)
+        staging_table = quote_name(f'{self._model._meta.db_table}_staging')
+        columns = ', '.join(quote_name(self._model._meta.get_field(field).column) for field in fields)
+        key_columns = ', '.join(quote_name(self._model._meta.get_field(field).column)
+                                for field in self._object_key_fields)
+        update_fields = [field for field in model_fields if field.name not in self._object_key_fields]
+        update_columns = [quote_name(field.column) for field in update_fields]
+
+        merge_sql = f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging_table} ' \
+                    f'ON CONFLICT ({key_columns}) DO '
+        if update_columns:
+            merge_sql += f'UPDATE SET {", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)} ' \
+                         f'WHERE {" OR ".join(self._get_changed_condition(table, field) for field in update_fields)} '
+        else:
+            merge_sql += 'NOTHING '
+        # xmax of inserted row version is zero, for updated it's id of current transaction
+        merge_sql += f'RETURNING {columns}, {quote_name(self._model._meta.pk.column)}, (xmax = 0)'
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {staging_table}')
+            cursor.execute(f'CREATE TEMPORARY TABLE {staging_table} ON COMMIT DROP AS '
+                           f'SELECT {columns} FROM {table} WITH NO DATA')
+            with cursor.copy(f'COPY {staging_table} ({columns}) FROM STDIN') as copy:
+                for item in data:
+                    copy.write_row([self._get_copy_value(field, item[field.name]) for field in model_fields])
+
+            cursor.execute(merge_sql)
+            merged_rows = cursor.fetchall()
+
+        insert = [self._model(**dict(zip(fields, row)), pk=pk) for *row, pk, inserted in merged_rows if inserted]
+        update = [self._model(**dict(zip(fields, row)), pk=pk) for *row, pk, inserted in merged_rows if not inserted]
+        self._save_fingerprints(
+            (obj.pk, self._get_fingerprint({field: getattr(obj, field) for field in fields})) for obj in insert + update
+        )
+
+        if insert:
+            self._log_update(f'Inserted {self._model.__name__}', insert)
+
+        if update:
+            self._log_update(f'Updated {self._model.__name__}', update)
+
+        return bool(merged_rows)
+
+    def _get_changed_condition(self, table, field):
+        """SQL condition of changed field, floats are compared with the same relative tolerance as in _is_equal"""
+        column = connection.ops.quote_name(field.column)
+        current, new = f'{table}.{column}', f'EXCLUDED.{column}'
+        if field.get_internal_type() != 'FloatField':
+            return f'{current} IS DISTINCT FROM {new}'
+
+        return f'(({current} IS NULL) <> ({new} IS NULL) ' \
+               f'OR abs({current} - {new}) > {self._float_rel_tol!r} * greatest(abs({current}), abs({new})))'
+
+    @staticmethod
+    def _get_copy_value(field, value):
+        """COPY takes text of values as is, so they are converted to types of fields, e.g. whole floats to integers"""
+        if value is None or isinstance(value, float) and math.isnan(value):
+            return None
+
+        return field.to_python(value)
+
     def _split_data(self, data):
+        """
+        Splits data to new and changed objects. Rows with the same fingerprint are skipped without comparison,
+        new fingerprints are collected with ids of existing rows to be saved after mapping.
+        """
         insert = []
         update = []
+        self.fingerprints = {}
+        existing_rows = self._get_existing_rows(data)
+        stored_fingerprints = TransformedDataFingerprint.get_fingerprints(
+            self._model, [row.id for row in existing_rows.values()]
+        )
 
         for item in data:
             key = self._get_item_key(item)
-            existing_obj = self.existing_objects.get(key)
+            existing_row = existing_rows.get(key)
+            fingerprint = self._get_fingerprint(item)
 
-            if existing_obj:
-                changed = self._update_existing(existing_obj, item)
-                if changed:
-                    update.append(existing_obj)
+            if existing_row:
+                if stored_fingerprints.get(existing_row.id) == fingerprint:
+                    continue
+
+                if self._is_changed(existing_row, item):
+                    update.append(self._model(**{**existing_row._asdict(), **item}))
             else:
                 insert.append(self._model(**item))
 
+            self.fingerprints[key] = (existing_row.id if existing_row else None, fingerprint)
+
         return insert, update
 
-    def _get_item_key(self, item):
-        return tuple(
-            getattr(item, key) if isinstance(item, self._model) else item[key] for key in self._object_key_fields
-        )
+    def _get_existing_rows(self, data):
+        """Loads rows only for weeks of data, as named tuples with key and update fields"""
+        if not data:
+            return {}
 
-    def _update_existing(self, existing_obj, item):
-        is_changed = False
-        for key, value in item.items():
-            if key not in self._object_key_fields and getattr(existing_obj, key) != value:
-                setattr(existing_obj, key, value)
-                is_changed = True
+        rows = self._model.objects.filter(
+            start_date__gte=min(item['start_date'] for item in data),
+            end_date__lte=max(item['end_date'] for item in data),
+        ).values_list('id', *self._object_key_fields, *self._update_fields, named=True)
 
-        return is_changed
+        return {self._get_item_key(row): row for row in rows}
 
-    def _log_update(self, message, objects):
-        for obj in objects:
+    def _get_item_key(self, item):
+        return tuple(item[key] if isinstance(item, dict) else getattr(item, key) for key in self._object_key_fields)
 
-            log_data = {}
-            for field in self._update_fields:
-                log_data[field] = getattr(obj, field)
+    def _is_changed(self, existing_row, item):
+        return any(
+            field in item and not self._is_equal(getattr(existing_row, field), item[field])
+            for field in self._update_fields
+        )
 
-            log_data.update(self._serialize_key_fields(obj))
+    def _is_equal(self, value, other):
+        if isinstance(value, float) or isinstance(other, float):
+            if value is None or other is None:
+                return value is other
+            return math.isclose(value, other, rel_tol=self._float_rel_tol)
+
+        return value == other
+
+    def _get_fingerprint(self, item):
+        values = (self._normalize_value(item.get(field)) for field in self._update_fields)
+        return hashlib.md5('|'.join(values).encode()).hexdigest()
+
+    def _normalize_value(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, (int, float)):
+            return format(float(value), f'.{self._fingerprint_digits}g')
+
+        return str(value)
+
+    def _save_fingerprints(self, fingerprints):
+        fingerprints = [
+            TransformedDataFingerprint(model_name=self._model.__name__, object_id=object_id, fingerprint=fingerprint)
+            for object_id, fingerprint in fingerprints
+        ]
+        TransformedDataFingerprint.objects.bulk_create(
+            fingerprints, batch_size=self._batch_size, update_conflicts=True,
+            unique_fields=['model_name', 'object_id'], update_fields=['fingerprint'],
+        )
 
-            self.logger.log(logging.INFO, message, **log_data)
+    def _log_update(self, message, objects):
+        rows = ({**{field: getattr(obj, field) for field in self._update_fields}, **self._serialize_key_fields(obj)}
+                for obj in objects)
+        self.logger.log_rows(logging.INFO, message, rows)
 
     def _serialize_key_fields(self, obj):
         raise NotImplemented
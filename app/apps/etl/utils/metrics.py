@@ -0,0 +1,22 @@
+import logging
+
+from django.conf import settings
+from prometheus_client import CollectorRegistry, push_to_gateway
+
+from apps.etl.utils.logging import get_task_logger
+
+ETL_METRICS_REGISTRY = CollectorRegistry()
+
+
+def push_metrics(job):
+    """
+    Pushes ETL metrics to Prometheus pushgateway, because tasks are run by Airflow worker, which isn't scraped.
+    Metrics of every job are kept by pushgateway in separate group, failed push doesn't fail the task.
+    """
+    if not settings.PROMETHEUS_PUSHGATEWAY:
+        return
+
+    try:
+        push_to_gateway(settings.PROMETHEUS_PUSHGATEWAY, job=job, registry=ETL_METRICS_REGISTRY)
+    except OSError as e:
+        get_task_logger().log(logging.WARNING, 'Metrics were not pushed', job=job, error=str(e))
@@ -7,6 +7,8 @@ from bs4 import BeautifulSoup
 from django.conf import settings
 from requests.status_codes import codes as status_codes
 
+from apps.etl.utils.http import get_http_cache
+
 
 def convert_str_to_date(date_str, date_format):
     return datetime.strptime(date_str, date_format).date()
@@ -24,11 +26,15 @@ class GogovParser:
         headers = requests.utils.default_headers()
         headers.update({'User-agent': 'Mozilla/5.0'})
         try:
-            response = requests.get(cls._url, headers=headers)
+            response = get_http_cache().get(cls._url, requests.get, headers=headers)
         except ConnectionError as e:
             print(str(e))
             return None
 
+        if response.not_modified:
+            # Page is parsed again from cache, as previous upload could fail, already imported date is skipped on upload
+            return response.text
+
         if response.status_code == status_codes.ok:
             return response.text
 
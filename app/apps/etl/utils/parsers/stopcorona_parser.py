@@ -1,13 +1,21 @@
 import re
+import hashlib
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from itertools import chain
+from functools import partial
 from copy import deepcopy, copy
 
+import lxml.html
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from lxml import etree
 from django.conf import settings
 
+from apps.etl.models import StopCoronaArticle
+from apps.etl.utils.http import RateLimiter, get_http_cache
 from apps.etl.utils.logging import get_task_logger
 
 
@@ -15,25 +23,48 @@ class StopCoronaParser:
     _url_base = settings.STOPCORONA_URL_BASE
     _url_articles_page = settings.STOPCORONA_URL_ARTICLES_PAGE
     _weekly_article_url_templates = ["v-rossii-za-nedelyu-vyzdorovelo-", "v-rossii-za-nedelyu-vyzdoroveli-"]
+    _max_workers = settings.STOPCORONA_MAX_WORKERS
+    _requests_per_second = settings.STOPCORONA_REQUESTS_PER_SECOND
 
     _region_fields = ['start_date', 'end_date', 'region', 'hospitalized', 'recovered', 'infected', 'deaths']
-    _date_matching_pattern = r"\d+\.\d+\.\d{4} *[-–] *\d+\.?\d+\.\d{4}|\d+\.?\d+\.? *[-–] *\d+\.?\d+\.\d{4}"
+    _date_matching_pattern = re.compile(
+        r"\d+\.\d+\.\d{4} *[-–] *\d+\.?\d+\.\d{4}|\d+\.?\d+\.? *[-–] *\d+\.?\d+\.\d{4}"
+    )
+    _dates_split_pattern = re.compile('-|–')
+    _cell_junk_pattern = re.compile('\\n\\t\\r')
     _date_format = '%d.%m.%Y'
 
-    _excluded_regions = ('Центральный федеральный округ', 'Южный федеральный округ', 'Уральский федеральный округ',
-                         'Сибирский федеральный округ', 'Северо-Кавказский федеральный округ',
-                         'Северо-Западный федеральный округ', 'Приволжский федеральный округ',
-                         'Дальневосточный федеральный округ')
+    _excluded_regions = frozenset((
+        'Центральный федеральный округ', 'Южный федеральный округ', 'Уральский федеральный округ',
+        'Сибирский федеральный округ', 'Северо-Кавказский федеральный округ', 'Северо-Западный федеральный округ',
+        'Приволжский федеральный округ', 'Дальневосточный федеральный округ',
+    ))
 
-    def __init__(self, all=False):
-        self.url_list = self._get_url_list(all)
+    def __init__(self, all=False, force=False):
+        self.all = all
         self.logger = get_task_logger()
+        self.crawl_states = {} if force else StopCoronaArticle.get_crawl_states()
+        self.http_cache = get_http_cache()
 
     @classmethod
-    def _get_url_list(cls, all):
+    def _get_url_list(cls, all, known_urls=()):
+        return list(cls._iter_url_list(all, known_urls))
+
+    @classmethod
+    def _iter_url_list(cls, all, known_urls=()):
+        """
+        Yields report urls as soon as listing page containing them is parsed.
+        Without all, pagination stops at first already crawled url, or at first report, if nothing is crawled yet.
+        """
         urls = []
         page = 1
-        search_function = cls._get_all_report_urls_on_page if all else cls._get_first_report_url_on_page
+        if all:
+            search_function = cls._get_all_report_urls_on_page
+        elif known_urls:
+            search_function = partial(cls._get_new_report_urls_on_page, known_urls=known_urls)
+        else:
+            search_function = cls._get_first_report_url_on_page
+
         while page:
             req = requests.get(cls._url_articles_page.format(page))
 
@@ -43,9 +74,9 @@ class StopCoronaParser:
             media_page = soup.find("body")
             material_cards = media_page.find_all("a", class_="u-material-card u-material-cards__card")
 
+            found_count = len(urls)
             page = None if search_function(material_cards, urls) else page + 1
-
-        return urls
+            yield from urls[found_count:]
 
     @classmethod
     def _get_all_report_urls_on_page(cls, material_cards, urls):
@@ -73,20 +104,121 @@ class StopCoronaParser:
 
         return got_url
 
-    def _parse_url_list(self, url_list):
-        parsed_data = []
+    @classmethod
+    def _get_new_report_urls_on_page(cls, material_cards, urls, known_urls):
+        if not material_cards:
+            return True
+
+        for card in material_cards:
+            href = str(card.get('href'))
+            if href in known_urls or href in urls:
+                return True
+
+            if any(template in href for template in cls._weekly_article_url_templates):
+                urls.append(href)
 
-        for url in url_list:
-            req = requests.get(self._url_base.format(url))
+        return False
 
-            regions_data = self._parse_page(req.text)
+    def _parse_url_list(self, url_list):
+        return [item for _, regions_data in self._iter_parsed_url_list(url_list) for item in regions_data]
+
+    def _iter_parsed_url_list(self, url_list):
+        """
+        Yields crawl state (url, etag, last modified, content hash) of every fetched article with its regions data.
+        Articles not modified since last crawl are skipped, unchanged ones are yielded without data to refresh
+        validators, articles which failed to parse aren't yielded at all, so they are retried on next crawl.
+        Crawl state isn't saved here, it should be saved together with uploaded data.
+        """
+        for url, response in self._fetch_pages(url_list):
+            crawl_state = self.crawl_states.get(url)
+            if response.not_modified and crawl_state:
+                continue
+
+            content_hash = hashlib.md5(response.text.encode()).hexdigest()
+            new_crawl_state = (url, response.headers.get('ETag'), response.headers.get('Last-Modified'), content_hash)
+
+            if crawl_state and crawl_state.content_hash == content_hash:
+                yield new_crawl_state, []
+                continue
+
+            regions_data = self._parse_page(response.text)
             if regions_data:
-                parsed_data.extend(regions_data)
+                self._log_parsed_data(regions_data)
+                yield new_crawl_state, regions_data
+
+    def _fetch_pages(self, url_list):
+        """
+        Fetches articles by pool of threads, responses are returned with their urls in order of url list.
+        Url list can be lazy, articles are fetched while next urls are still being discovered.
+        """
+        rate_limiter = RateLimiter(self._requests_per_second)
+
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            session.mount('https://', HTTPAdapter(pool_maxsize=self._max_workers))
+            session.mount('http://', HTTPAdapter(pool_maxsize=self._max_workers))
+
+            fetch_page = partial(self._fetch_page, session, rate_limiter)
+            pending = deque()
+            for url in url_list:
+                pending.append(executor.submit(fetch_page, url))
+                if len(pending) > self._max_workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
 
-        self._log_parsed_data(parsed_data)
-        return parsed_data
+    def _fetch_page(self, session, rate_limiter, url):
+        crawl_state = self.crawl_states.get(url)
+        headers = crawl_state.get_conditional_headers() if crawl_state else {}
+
+        page_url = self._url_base.format(url)
+        rate_limiter.wait(page_url)
+
+        return url, self.http_cache.get(page_url, session.get, headers=headers)
 
     def _parse_page(self, src):
+        page_data = self._extract_page_data(src)
+        if page_data is None:
+            return self._parse_page_html5lib(src)
+
+        date_text, table_data = page_data
+        dates = self._parse_dates(date_text)
+        if not dates:
+            return None
+
+        table_data = self._clean_table_texts(table_data)
+
+        regions_data = self._get_regions_data(table_data, dates)
+
+        return regions_data
+
+    @staticmethod
+    def _extract_page_data(src):
+        """
+        Fast path of article parsing, extracts dates text and table cells texts by lxml.
+        Returns None if page doesn't look like weekly report, so it's parsed by html5lib.
+        """
+        try:
+            tree = lxml.html.fromstring(src)
+        except (etree.ParserError, ValueError):
+            return None
+
+        detail__body = tree.find_class('article-detail__body')
+        if not detail__body or detail__body[0].tag != 'div':
+            return None
+
+        h3 = detail__body[0].find('.//h3')
+        tbody = detail__body[0].find('.//tbody')
+        if h3 is None or tbody is None:
+            return None
+
+        table_data = [td.text_content() for td in tbody.iter('td')]
+        if len(table_data) < 6:
+            return None
+
+        return h3.text_content(), table_data
+
+    def _parse_page_html5lib(self, src):
         soup = BeautifulSoup(src, 'html5lib')
 
         detail__body = soup.find("div", class_="article-detail__body")
@@ -105,13 +237,15 @@ class StopCoronaParser:
         return regions_data
 
     def _get_dates(self, detail__body):
-        date_text = detail__body.find("h3").text
-        matches = re.findall(self._date_matching_pattern, date_text)
+        return self._parse_dates(detail__body.find("h3").text)
+
+    def _parse_dates(self, date_text):
+        matches = self._date_matching_pattern.findall(date_text)
         if len(matches) != 1:
             self.logger.log(logging.ERROR, f'Can\'t get date from text. No matching pattern.', date_text=date_text)
             return
 
-        dates = re.split('-|–', matches[0])
+        dates = self._dates_split_pattern.split(matches[0])
         if len(dates) != 2:
             self.logger.log(logging.ERROR, f'Can\'t split dates properly. No matching pattern.', dates=dates)
             return
@@ -134,43 +268,51 @@ class StopCoronaParser:
 
         return dates
 
-    @staticmethod
-    def _clean_table_data(table_data):
-        if 'Наименование субъекта' in table_data[0].text:
-            table_data = table_data[5:]
-        else:
-            table_data = table_data[6:]
+    @classmethod
+    def _clean_table_data(cls, table_data):
+        return cls._clean_table_texts([td.text for td in table_data])
 
-        for i, td in enumerate(table_data):
-            table_data[i] = re.sub('\\n\\t\\r', '', td.text).strip()
+    @classmethod
+    def _clean_table_texts(cls, table_data):
+        table_data = table_data[5:] if 'Наименование субъекта' in table_data[0] else table_data[6:]
+        return [cls._clean_cell(text) for text in table_data]
 
-            temp = table_data[i].replace(' ', '')
-            if temp.isdecimal():
-                table_data[i] = int(temp)
+    @classmethod
+    def _clean_cell(cls, text):
+        text = cls._cell_junk_pattern.sub('', text).strip()
 
-        return table_data
+        number = text.replace(' ', '')
+        return int(number) if number.isdecimal() else text
 
     @classmethod
     def _get_regions_data(cls, table_data, dates):
-        regions_data = [
-            dict(zip(cls._region_fields, chain(dates, table_data[i:i + 5])))
-            for i in range(0, len(table_data), 5)
-        ]
-
-        regions_data = list(filter(lambda x: x['region'] not in cls._excluded_regions, regions_data))
-        regions_data = list(filter(lambda x: x['region'], regions_data))
+        """Builds regions data in one pass over rows of 5 cells, skips federal districts and rows without region"""
+        start_date, end_date = dates
+        fields = cls._region_fields
+        excluded_regions = cls._excluded_regions
+
+        regions_data = []
+        for i in range(0, len(table_data), 5):
+            row = table_data[i:i + 5]
+            region = row[0]
+            if region and region not in excluded_regions:
+                regions_data.append(dict(zip(fields, (start_date, end_date, *row))))
 
         return regions_data
 
     def _log_parsed_data(self, parsed_data):
-        for item in parsed_data:
-            start_date = item['start_date'].strftime('%d-%m-%Y')
-            end_date = item['end_date'].strftime('%d-%m-%Y')
+        rows = ({**item,
+                 'start_date': item['start_date'].strftime('%d-%m-%Y'),
+                 'end_date': item['end_date'].strftime('%d-%m-%Y')} for item in parsed_data)
+        self.logger.log_rows(logging.INFO, 'Parsed from stopcorona', rows)
+
+    def iter_parsed_articles(self):
+        """Yields crawl states and regions data of articles while listing pages are still being discovered"""
+        return self._iter_parsed_url_list(self._iter_url_list(self.all, self.crawl_states.keys()))
 
-            log_data = {**item,
-                        'start_date': item['start_date'].strftime('%d-%m-%Y'),
-                        'end_date': item['end_date'].strftime('%d-%m-%Y')}
-            self.logger.log(logging.INFO, 'Parsed from stopcorona', **log_data, )
+    def iter_parsed_data(self):
+        for _, regions_data in self.iter_parsed_articles():
+            yield from regions_data
 
     def get_parsed_data(self):
-        return self._parse_url_list(self.url_list)
+        return list(self.iter_parsed_data())
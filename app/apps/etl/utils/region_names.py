@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class RegionNamesNormalizer:
+    """Converts stopcorona region names to names used in transformed data"""
+    _regions_map = {
+        'Республика Карелия': 'Карелия', 'Еврейская автономная область': 'Еврейская АО',
+        'Республика Коми': 'Коми', 'Республика Адыгея': 'Адыгея',
+        'Кабардино-Балкарская Республика': 'Кабардино-Балкария', 'Республика Хакасия': 'Хакасия',
+        'Ямало-Ненецкий автономный округ': 'Ямало-Ненецкий АО', 'Республика Крым': 'Крым',
+        'Чувашская Республика': 'Чувашия', 'Ханты-Мансийский АО': 'ХМАО – Югра',
+        'Ханты-Мансийский автономный округ': 'ХМАО – Югра', 'Ненецкий автономный округ': 'Ненецкий АО',
+        'Чеченская Республика': 'Чечня', 'Республика Тыва': 'Тыва', 'Республика Калмыкия': 'Калмыкия',
+        'Республика Саха (Якутия)': 'Саха (Якутия)', 'Республика Мордовия': 'Мордовия',
+        'Удмуртская Республика': 'Удмуртия', 'Республика Башкортостан': 'Башкортостан',
+        'Республика Татарстан': 'Татарстан', 'Республика Северная Осетия — Алания': 'Северная Осетия',
+        'Карачаево-Черкесская Республика': 'Карачаево-Черкессия', 'Республика Ингушетия': 'Ингушетия',
+        'Чукотский автономный округ': 'Чукотский АО', 'Республика Бурятия': 'Бурятия',
+        'Республика Дагестан': 'Дагестан', 'Республика Марий Эл': 'Марий Эл', 'Республика Алтай': 'Алтай',
+        'область': 'обл.',
+    }
+    # Names are also replaced when they are only a part of region name, e.g. 'область' in 'Томская область'
+    _regions_pattern = re.compile('|'.join(map(re.escape, _regions_map)))
+
+    @classmethod
+    def normalize_name(cls, name):
+        if not isinstance(name, str):
+            return name
+
+        return cls._regions_pattern.sub(lambda match: cls._regions_map[match.group()], name)
+
+    @classmethod
+    def normalize(cls, regions):
+        """Normalizes each distinct name of regions series once and broadcasts results back to rows"""
+        codes, names = pd.factorize(regions, use_na_sentinel=False)
+        normalized_names = np.array([cls.normalize_name(name) for name in names], dtype=object)
+
+        return pd.Series(normalized_names[codes], index=regions.index, name=regions.name)
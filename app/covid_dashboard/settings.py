@@ -1,3 +1,4 @@
+import tempfile
 from pathlib import Path
 
 from environs import Env
@@ -106,6 +107,14 @@ REST_FRAMEWORK = {
     "EXCEPTION_HANDLER": "drf_standardized_errors.handler.exception_handler",
 }
 
+CACHES = {
+    'default': env.dj_cache_url("CACHE_URL", "locmem://"),
+}
+# Rendered dataset responses are cached until dataset version is bumped by ETL load
+DATASET_CACHE_TIMEOUT = 24 * 60 * 60
+# Rows of all=true dataset exports are streamed by chunks of this size
+DATASET_EXPORT_CHUNK_SIZE = 2000
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Covid dashboard API',
     'DESCRIPTION': 'API provides covid-19 data for BI systems',
@@ -147,13 +156,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CSRF_TRUSTED_ORIGINS = env.list("DJANGO_CSRF_TRUSTED_ORIGINS")
 
 DEFAULT_CSV_PATH = str(BASE_DIR.joinpath('apps/etl/data/data.csv'))
+# Csv file is validated columnar-wise and loaded by bulk_create, rejected rows are written to rejects file
+CSV_BULK_IMPORT = env.bool("CSV_BULK_IMPORT", False)
 STOPCORONA_URL_BASE = 'https://xn--90aivcdt6dxbc.xn--p1ai/{}'
 STOPCORONA_URL_ARTICLES_PAGE = STOPCORONA_URL_BASE.format('stopkoronavirus/?isAjax=Y&action=itemsMore&PAGEN_1={}')
+STOPCORONA_MAX_WORKERS = 8
+STOPCORONA_REQUESTS_PER_SECOND = 10
+
+HTTP_CACHE_DIR = env.str("HTTP_CACHE_DIR", str(Path(tempfile.gettempdir()).joinpath('etl_http_cache')))
+HTTP_CACHE_MAX_SIZE = 100 * 1024 * 1024
+# Address of Prometheus pushgateway, which receives metrics of ETL tasks
+PROMETHEUS_PUSHGATEWAY = env.str("PROMETHEUS_PUSHGATEWAY", None)
 
 GOGOV_URL = 'https://gogov.ru/articles/covid-v-stats'
 
 REGIONS_PATH = str(BASE_DIR.joinpath('apps/etl/data/regions_data.pkl'))
 
+# Legacy weekly aggregation is done by external database instead of pandas
+LEGACY_SQL_PUSHDOWN = env.bool("LEGACY_SQL_PUSHDOWN", False)
+
+# Transformed data is loaded by COPY into staging table and merged by INSERT ... ON CONFLICT
+TRANSFORMED_DATA_COPY_LOAD = env.bool("TRANSFORMED_DATA_COPY_LOAD", False)
+
+# Rows of ETL results are logged as count with a few samples instead of record per row
+ETL_LOG_SUMMARY = env.bool("ETL_LOG_SUMMARY", False)
+ETL_LOG_SAMPLE_SIZE = 5
+
 if DEBUG:
     from covid_dashboard.settings_dev import *
 else:
@@ -19,10 +19,11 @@ LOGGING = {
         },
         'loki': {
             'level': 'INFO',
-            'class': 'logging_loki.LokiHandler',
+            'class': 'apps.etl.utils.logging.BatchingLokiHandler',
             'url': f"http://{env.str('LOKI_HOST', 'loki')}:3100/loki/api/v1/push",
             'tags': {"app": "web", },
-            'version': "1",
+            'batch_size': 500,
+            'flush_interval': 2.0,
             'formatter': 'standard',
         },
     },